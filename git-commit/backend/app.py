@@ -1,28 +1,86 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import os
-from typing import Any, Dict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
+from git import Repo
 
 from commit_core import (
+    SUMMARY_CACHE,
+    agenerate_commit_messages,
+    compose_commit_message,
     ensure_git_repo,
     ensure_project_dir,
-    generate_commit_message,
     get_changes_summary,
+    llm_deadline,
     load_config,
     maybe_auto_commit,
+    model_warmth,
+    normalize_commit_type,
+    repo_fingerprint,
     save_config,
+    warm_up_model,
 )
+from batch import iter_batch, normalize_repos
+from fallback import local_commit_message
+from jobs import JobManager, QueueFullError
+from metrics import render as render_metrics
+from response_cache import get_response_cache
+from singleflight import Singleflight
 
 app = Flask(__name__)
 CORS(app)
 
+# In-flight /generateCommitMessage work, shared between identical requests
+INFLIGHT = Singleflight()
+
+# Background generation jobs (POST /jobs); bounded workers and queue
+JOBS = JobManager(
+    max_workers=int(os.getenv("JOB_WORKERS", "4")),
+    max_pending=int(os.getenv("JOB_MAX_PENDING", "64")),
+)
+
+# Seconds between SSE keep-alive comments while a job is quiet
+SSE_KEEPALIVE = 15.0
+
+# Model used for startup warm-up and /health (projects may override it)
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "provider": "ollama",
+    "model": os.getenv("OLLAMA_MODEL", "qwen3:1.7b"),
+    "keep_alive": os.getenv("OLLAMA_KEEP_ALIVE"),
+}
+
+
+def start_warm_up() -> None:
+    """Preload the model so the first request after boot is fast
+    (OLLAMA_WARMUP=0 disables it). Called at server start, not on import;
+    a WSGI deployment can call it from its post-fork hook."""
+    if os.getenv("OLLAMA_WARMUP", "1") != "0":
+        warm_up_model(DEFAULT_CONFIG)
+
 
 @app.get("/health")
 def health():
-    return jsonify({"ok": True})
+    return jsonify(
+        {
+            "ok": True,
+            "summaryCache": SUMMARY_CACHE.stats(),
+            "singleflight": INFLIGHT.stats(),
+            "jobs": JOBS.stats(),
+            "model": {"name": DEFAULT_CONFIG["model"], "status": model_warmth(DEFAULT_CONFIG)},
+        }
+    )
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text format: per-stage latency histograms and LLM token stats."""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
 
 
 @app.post("/setup")
@@ -55,6 +113,166 @@ def setup():
     )
 
 
+class RequestError(Exception):
+    """Invalid request; reported to the client as a 400 JSON error."""
+
+
+@dataclass
+class GenerationRequest:
+    project_dir: str
+    repo: Repo
+    config: Dict[str, Any]
+    commit_type: str
+    custom_message: str
+    auto_commit: bool
+    diff_mode: str
+    no_cache: bool
+    n_candidates: int
+    deadline: Optional[float]
+
+
+# stage(event, data) callback used to report progress of a generation
+StageFn = Callable[[str, Optional[Dict[str, Any]]], None]
+
+
+def _no_stage(event: str, data: Optional[Dict[str, Any]] = None) -> None:
+    pass
+
+
+def parse_generation_request(data: Dict[str, Any]) -> GenerationRequest:
+    """Validate a /generateCommitMessage body (raises RequestError)."""
+    project_dir = data.get("projectDir")
+    if not project_dir:
+        raise RequestError("projectDir is required")
+
+    project_dir = ensure_project_dir(project_dir)
+
+    try:
+        n_candidates = max(1, min(8, int(data.get("candidates") or 1)))
+        deadline = float(data["deadline"]) if data.get("deadline") is not None else None
+    except (TypeError, ValueError):
+        raise RequestError("candidates must be an int and deadline a number")
+
+    config = load_config(project_dir)
+    if not config:
+        raise RequestError("Missing config. Call POST /setup first.")
+
+    repo = ensure_git_repo(project_dir)
+    if repo is None:
+        raise RequestError("No git repository found in projectDir.")
+
+    return GenerationRequest(
+        project_dir=project_dir,
+        repo=repo,
+        config=config,
+        commit_type=str(data.get("commitType") or "chore").strip(),
+        custom_message=str(data.get("customMessage") or "").strip(),
+        auto_commit=bool(data.get("autoCommit", False)),
+        diff_mode=str(data.get("diffMode") or "unstaged").strip(),
+        no_cache=bool(data.get("noCache", False)),
+        n_candidates=n_candidates,
+        deadline=deadline,
+    )
+
+
+def run_generation(req: GenerationRequest, stage: StageFn = _no_stage) -> Dict[str, Any]:
+    """Scan, generate and optionally commit; returns the response body."""
+    repo = req.repo
+    cache = None if req.no_cache else get_response_cache(req.project_dir)
+
+    def scan_and_generate(stage: StageFn = stage) -> Tuple[Dict[str, Any], Dict[str, str], List[str]]:
+        stage("scanning", None)
+        summary = get_changes_summary(repo, mode=req.diff_mode)
+        diff_summary = summary["summary_text"] if summary["files"] else "general updates"
+        stage("generating", {"filesChanged": len(summary["files"])})
+
+        candidates: List[str] = []
+        if req.n_candidates > 1 and not req.custom_message:
+            error: Optional[str] = None
+            try:
+                candidates = asyncio.run(
+                    agenerate_commit_messages(
+                        req.commit_type,
+                        req.config,
+                        diff_summary,
+                        n=req.n_candidates,
+                        deadline=req.deadline if req.deadline is not None else llm_deadline(req.config),
+                        cache=cache,
+                    )
+                )
+            except Exception as e:  # every candidate failed: same fallback as a single call
+                error = f"{e.__class__.__name__}: {e}"
+            if candidates:
+                return summary, {"message": candidates[0], "source": "llm"}, candidates
+            fallback = local_commit_message(normalize_commit_type(req.commit_type), summary)
+            result = {"message": fallback, "source": "fallback"}
+            if error:
+                result["error"] = error
+            return summary, result, candidates
+
+        result = compose_commit_message(
+            commit_type=req.commit_type,
+            custom_message=req.custom_message,
+            config=req.config,
+            diff_summary=diff_summary,
+            summary=summary,
+            cache=cache,
+            deadline=req.deadline,
+            on_token=lambda text: stage("token", {"text": text}),
+        )
+        return summary, result, candidates
+
+    # Identical concurrent requests (editors + hooks on the same repo) share
+    # one git scan and one LLM call; stage events go out through INFLIGHT so
+    # every request sharing the call sees them. Auto-commits mutate the
+    # repo, so they always run on their own.
+    coalesced = False
+    if req.auto_commit:
+        summary, result, candidates = scan_and_generate()
+    else:
+        key = (
+            req.project_dir,
+            req.diff_mode,
+            normalize_commit_type(req.commit_type),
+            req.custom_message,
+            req.n_candidates,
+            req.deadline,
+            req.no_cache,
+            repo_fingerprint(repo),
+        )
+
+        def shared_stage(event: str, data: Optional[Dict[str, Any]] = None) -> None:
+            INFLIGHT.notify(key, event, data)
+
+        (summary, result, candidates), coalesced = INFLIGHT.do(
+            key, lambda: scan_and_generate(stage=shared_stage), listener=stage
+        )
+
+    commit_message = result["message"]
+
+    auto_commit_result = "Auto-commit not performed."
+    if req.auto_commit:
+        stage("committing", None)
+        auto_commit_result = maybe_auto_commit(repo, commit_message, stage_all=True)
+
+    return {
+        "commitMessage": commit_message,
+        "messageSource": result["source"],
+        "messageError": result.get("error"),
+        "candidates": candidates or [commit_message],
+        "experience": summary["insertions"] + summary["deletions"],
+        "enemiesSlain": len(summary["files"]),
+        "diffMode": summary["mode"],
+        "stats": {
+            "filesChanged": len(summary["files"]),
+            "insertions": summary["insertions"],
+            "deletions": summary["deletions"],
+        },
+        "autoCommitResponse": auto_commit_result,
+        "coalesced": coalesced,
+    }
+
+
 @app.post("/generateCommitMessage")
 def generate():
     """
@@ -65,58 +283,129 @@ def generate():
       - customMessage (optional)
       - autoCommit (optional bool)
       - diffMode (optional: "unstaged" | "staged")
+      - noCache (optional bool) bypass the LLM response cache
+      - candidates (optional int) generate N messages concurrently
+      - deadline (optional float seconds) LLM time budget; when it passes the
+        message comes from the offline generator (messageSource "fallback");
+        if the provider failed instead, messageError says why
     """
     data: Dict[str, Any] = request.get_json(force=True, silent=True) or {}
+    try:
+        req = parse_generation_request(data)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(run_generation(req))
 
-    project_dir = data.get("projectDir")
-    if not project_dir:
-        return jsonify({"error": "projectDir is required"}), 400
 
-    project_dir = ensure_project_dir(project_dir)
+@app.post("/generateCommitMessages")
+def generate_batch():
+    """
+    Generate commit messages for many repos; streams JSON lines.
+    Request body:
+      - repos (required) list of paths or objects with projectDir and any of
+        commitType, customMessage, diffMode, noCache, deadline
+      - commitType, diffMode, noCache, deadline (optional) defaults for repos
+      - scanWorkers, llmWorkers (optional int) parallel scans / LLM calls
+    Each line is one repo's result (with per-repo timings) in completion
+    order; the last line is {"done": true, ...}. Malformed entries get a 400
+    before anything runs; a projectDir that doesn't exist is reported on its
+    own line with ok: false (batches never create directories).
+    """
+    data: Dict[str, Any] = request.get_json(force=True, silent=True) or {}
+    repos = data.get("repos")
+    if not isinstance(repos, list) or not repos:
+        return jsonify({"error": "repos must be a non-empty list"}), 400
 
-    commit_type = str(data.get("commitType") or "chore").strip()
-    custom_message = str(data.get("customMessage") or "").strip()
-    auto_commit = bool(data.get("autoCommit", False))
-    diff_mode = str(data.get("diffMode") or "unstaged").strip()
+    defaults = {k: data[k] for k in ("commitType", "diffMode", "noCache", "deadline") if k in data}
+    try:
+        items = normalize_repos(repos, defaults)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        scan_workers = int(data["scanWorkers"]) if data.get("scanWorkers") else None
+        llm_workers = int(data["llmWorkers"]) if data.get("llmWorkers") else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "scanWorkers and llmWorkers must be ints"}), 400
 
-    config = load_config(project_dir)
-    if not config:
-        return jsonify({"error": "Missing config. Call POST /setup first."}), 400
+    def stream() -> Iterator[str]:
+        for res in iter_batch(items, scan_workers=scan_workers, llm_workers=llm_workers):
+            yield json.dumps(res) + "\n"
 
-    repo = ensure_git_repo(project_dir)
-    if repo is None:
-        return jsonify({"error": "No git repository found in projectDir."}), 400
+    return Response(stream(), mimetype="application/x-ndjson")
 
-    summary = get_changes_summary(repo, mode=diff_mode)
-    diff_summary = summary["summary_text"] if summary["files"] else "general updates"
 
-    commit_message = generate_commit_message(
-        commit_type=commit_type,
-        custom_message=custom_message,
-        config=config,
-        diff_summary=diff_summary,
+@app.post("/jobs")
+def create_job():
+    """
+    Start /generateCommitMessage work in the background.
+    Takes the same body; returns 202 with a jobId right away. Follow the
+    job at GET /jobs/<id>/events (SSE) or poll GET /jobs/<id>.
+    """
+    data: Dict[str, Any] = request.get_json(force=True, silent=True) or {}
+    try:
+        req = parse_generation_request(data)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        job = JOBS.submit(lambda job: run_generation(req, stage=job.emit))
+    except QueueFullError:
+        return jsonify({"error": "Too many pending jobs, retry later."}), 429
+
+    return (
+        jsonify({"jobId": job.id, "status": job.status, "events": f"/jobs/{job.id}/events"}),
+        202,
     )
 
-    auto_commit_result = "Auto-commit not performed."
-    if auto_commit:
-        auto_commit_result = maybe_auto_commit(repo, commit_message, stage_all=True)
 
-    return jsonify(
-        {
-            "commitMessage": commit_message,
-            "experience": summary["insertions"] + summary["deletions"],
-            "enemiesSlain": len(summary["files"]),
-            "diffMode": summary["mode"],
-            "stats": {
-                "filesChanged": len(summary["files"]),
-                "insertions": summary["insertions"],
-                "deletions": summary["deletions"],
-            },
-            "autoCommitResponse": auto_commit_result,
-        }
+@app.get("/jobs/<job_id>")
+def job_status(job_id: str):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job.snapshot())
+
+
+@app.get("/jobs/<job_id>/events")
+def job_events(job_id: str):
+    """
+    Server-Sent Events stream of a job's stages:
+    queued → scanning → generating → token* → (committing) → done | error.
+    A job coalesced onto an identical in-flight one gets the shared call's
+    stages too, replayed from the start. Reconnecting clients can send
+    Last-Event-ID to resume.
+    """
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+
+    last_id = request.headers.get("Last-Event-ID", "")
+    start = int(last_id) + 1 if last_id.isdigit() else 0
+
+    def stream() -> Iterator[str]:
+        idx = start
+        while True:
+            events, finished = job.wait_events(idx, timeout=SSE_KEEPALIVE)
+            for event, payload in events:
+                yield f"id: {idx}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+                idx += 1
+            if finished and not events:
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "5000"))
-    app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
+    debug = True
+    # With the debug reloader this block also runs in the watcher process;
+    # only the serving child (WERKZEUG_RUN_MAIN) warms the model
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warm_up()
+    app.run(host="0.0.0.0", port=port, debug=debug)
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""
+arenaview.py
+
+Arena display widget that repaints only the rows that changed.
+
+A Static re-renders and re-sends its whole region on every update(), so
+each animation frame of the arena rewrote the full corridor even when
+only the HUD rows or the HP bar moved. ArenaView keeps the previous
+frame, compares it row by row with the new one and marks just the
+changed row spans dirty; Textual then asks for those rows through the
+line API (`render_line`) and writes only them to the terminal.
+
+Run `python arenaview.py` to compare the bytes written to the terminal
+for a swing animation through a Static and through ArenaView.
+"""
+
+from __future__ import annotations
+
+from typing import Any, List, Tuple
+
+from rich.segment import Segment
+from textual import events
+from textual.geometry import Region, Size
+from textual.message import Message
+from textual.strip import Strip
+from textual.widget import Widget
+
+
+def changed_spans(old: List[str], new: List[str]) -> List[Tuple[int, int]]:
+    """(first row, row count) of each run of rows that differ."""
+    spans: List[Tuple[int, int]] = []
+    start = -1
+    rows = max(len(old), len(new))
+    for y in range(rows + 1):
+        differs = y < rows and (y >= len(old) or y >= len(new) or old[y] != new[y])
+        if differs and start < 0:
+            start = y
+        elif not differs and start >= 0:
+            spans.append((start, y - start))
+            start = -1
+    return spans
+
+
+class ArenaView(Widget):
+    """Plain-text frame display with row-level dirty tracking."""
+
+    class Resized(Message):
+        """Posted when the view's own size changed. Unlike the app's Resize
+        it arrives after layout, so `size` is the one to draw at."""
+
+        def __init__(self, size: Size) -> None:
+            super().__init__()
+            self.size = size
+
+    def __init__(self, text: str = "", **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._lines: List[str] = text.split("\n") if text else []
+        self.frames = 0         # update() calls
+        self.rows_repainted = 0  # rows marked dirty across all updates
+
+    def update(self, text: str) -> None:
+        """Show `text`, repainting only the rows that differ from the last frame."""
+        lines = text.split("\n")
+        spans = changed_spans(self._lines, lines)
+        self._lines = lines
+        self.frames += 1
+        if not spans:
+            return
+        width = self.size.width
+        for y, height in spans:
+            self.rows_repainted += height
+            self.refresh(Region(0, y, width, height))
+
+    def on_resize(self, event: events.Resize) -> None:
+        self.post_message(self.Resized(event.size))
+
+    def render_line(self, y: int) -> Strip:
+        style = self.rich_style
+        text = self._lines[y] if y < len(self._lines) else ""
+        return Strip([Segment(text, style)]).adjust_cell_length(self.size.width, style)
+
+
+# ---------------------------------------------------------------------------
+# Benchmark: python arenaview.py
+# ---------------------------------------------------------------------------
+
+def _benchmark() -> None:
+    import asyncio
+
+    from textual.app import App, ComposeResult
+    from textual.widgets import Static
+
+    from chargrid import CharGrid
+
+    w, h = 200, 60
+    corridor = CharGrid.from_lines(
+        [("|  \\" + " " * (w - 8) + "/  |") if y % 3 else ("|" + "-" * (w - 2) + "|") for y in range(h)], w, h
+    )
+    # A swing: the corridor stays, the HUD rows (last 9) and the HP bar move
+    frames: List[str] = []
+    for i in range(12):
+        grid = corridor.copy()
+        grid.burn(w // 2 - 12, h // 3, f"[{'#' * (20 - i)}{'.' * i}] {40 - i}hp")
+        for row in range(h - 9, h):
+            grid.burn(0, row, (" " * (i * 2)) + "/||\\" * 10)
+        frames.append(str(grid))
+
+    class Bench(App[None]):
+        def __init__(self, widget: Widget) -> None:
+            super().__init__()
+            self.widget = widget
+
+        def compose(self) -> ComposeResult:
+            yield self.widget
+
+    async def measure(widget: Widget) -> int:
+        app = Bench(widget)
+        async with app.run_test(size=(w, h)) as pilot:
+            widget.update(frames[0])  # type: ignore[attr-defined]
+            await pilot.pause()
+            # Headless apps skip the terminal write; render what would be sent
+            written = 0
+            display = app._display
+
+            def counting_display(screen: Any, renderable: Any) -> None:
+                nonlocal written
+                if renderable is not None:
+                    console = app.console
+                    written += len(console._render_buffer(console.render(renderable)).encode("utf-8"))
+                display(screen, renderable)
+
+            app._display = counting_display  # type: ignore[method-assign]
+            for frame in frames[1:]:
+                widget.update(frame)  # type: ignore[attr-defined]
+                await pilot.pause()
+            return written
+
+    async def run() -> None:
+        static = await measure(Static())
+        arena = await measure(ArenaView())
+        n = len(frames) - 1
+        print(f"{w}x{h} swing, {n} frames")
+        print(f"  Static     {static:>9} bytes  ({static // n} per frame)")
+        print(f"  ArenaView  {arena:>9} bytes  ({arena // n} per frame)  {static / max(1, arena):.1f}x less")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    _benchmark()
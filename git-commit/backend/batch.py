@@ -0,0 +1,188 @@
+"""
+batch.py
+
+Commit messages for many repositories in one run.
+
+Repos are scanned in parallel on a thread pool sized to the machine (the
+work is git subprocesses and file stats, so threads are enough). Each
+finished scan is handed to a second, `llm_workers`-sized pool, so a large
+batch never has more than that many generations in flight against the
+model server and scan threads never sit waiting for the model. Results
+come back as soon as each repo finishes, with per-repo timings, for the
+CLI and the HTTP API to stream as JSON lines.
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from commit_core import (
+    compose_commit_message,
+    ensure_git_repo,
+    get_changes_summary,
+    load_config,
+)
+from response_cache import get_response_cache
+
+# Parallel repo scans (default: two per CPU, capped; mostly waiting on git)
+DEFAULT_SCAN_WORKERS = int(os.getenv("BATCH_SCAN_WORKERS", "0")) or min(32, (os.cpu_count() or 1) * 2)
+
+# Concurrent LLM generations; a local Ollama serves only a few at once
+DEFAULT_LLM_WORKERS = int(os.getenv("BATCH_LLM_WORKERS", "2"))
+
+# A repo spec is a path or a dict with projectDir and per-repo overrides
+RepoSpec = Union[str, Dict[str, Any]]
+
+
+def _ms(start: float, end: float) -> float:
+    return round((end - start) * 1000, 1)
+
+
+def normalize_repos(repos: Iterable[RepoSpec], defaults: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Turn repo specs into dicts with `defaults` filled in. Raises ValueError
+    for an entry that is neither a path nor an object with a projectDir, so
+    callers can reject the whole batch before any work starts.
+    """
+    items: List[Dict[str, Any]] = []
+    for i, spec in enumerate(repos):
+        if isinstance(spec, str):
+            item: Dict[str, Any] = {"projectDir": spec}
+        elif isinstance(spec, dict):
+            item = dict(spec)
+        else:
+            raise ValueError(f"repos[{i}] must be a path or an object")
+        if not isinstance(item.get("projectDir"), str) or not item["projectDir"].strip():
+            raise ValueError(f"repos[{i}] needs a non-empty projectDir")
+        for key, value in (defaults or {}).items():
+            item.setdefault(key, value)
+        items.append(item)
+    return items
+
+
+def _scan_one(item: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """First stage: resolve and scan the repo. Returns the result so far and
+    what generation needs, or (failed result, None)."""
+    t0 = time.perf_counter()
+    out: Dict[str, Any] = {"projectDir": item["projectDir"], "ok": False}
+    try:
+        # Unlike single requests, a batch never creates directories
+        path = Path(item["projectDir"]).expanduser().resolve()
+        if not path.is_dir():
+            raise ValueError("projectDir does not exist.")
+        project_dir = str(path)
+        out["projectDir"] = project_dir
+
+        config = load_config(project_dir)
+        if not config:
+            raise ValueError("Missing config. Run setup for this repo first.")
+        repo = ensure_git_repo(project_dir)
+        if repo is None:
+            raise ValueError("No git repository found in projectDir.")
+
+        summary = get_changes_summary(repo, mode=str(item.get("diffMode") or "unstaged"))
+    except Exception as e:
+        out["error"] = str(e)
+        out["timings"] = {"totalMs": _ms(t0, time.perf_counter())}
+        return out, None
+    return out, {"item": item, "config": config, "summary": summary, "t0": t0, "t_scan": time.perf_counter()}
+
+
+def _generate_one(out: Dict[str, Any], scan: Dict[str, Any]) -> Dict[str, Any]:
+    """Second stage, on the LLM pool: generate the message for a scanned repo."""
+    item, summary, t0, t_scan = scan["item"], scan["summary"], scan["t0"], scan["t_scan"]
+    # The deadline starts here, once an LLM worker picked the repo up
+    t_slot = time.perf_counter()
+    try:
+        result = compose_commit_message(
+            commit_type=str(item.get("commitType") or "chore"),
+            custom_message=str(item.get("customMessage") or "").strip(),
+            config=scan["config"],
+            diff_summary=summary["summary_text"] if summary["files"] else "general updates",
+            summary=summary,
+            cache=None if item.get("noCache") else get_response_cache(out["projectDir"]),
+            deadline=item.get("deadline"),
+        )
+        t_gen = time.perf_counter()
+
+        out.update(
+            ok=True,
+            commitMessage=result["message"],
+            messageSource=result["source"],
+            messageError=result.get("error"),
+            diffMode=summary["mode"],
+            stats={
+                "filesChanged": len(summary["files"]),
+                "insertions": summary["insertions"],
+                "deletions": summary["deletions"],
+            },
+            timings={
+                "scanMs": _ms(t0, t_scan),
+                "queueMs": _ms(t_scan, t_slot),
+                "generateMs": _ms(t_slot, t_gen),
+                "totalMs": _ms(t0, t_gen),
+            },
+        )
+    except Exception as e:
+        out["error"] = str(e)
+        out["timings"] = {"totalMs": _ms(t0, time.perf_counter())}
+    return out
+
+
+def iter_batch(
+    repos: Iterable[RepoSpec],
+    defaults: Optional[Dict[str, Any]] = None,
+    scan_workers: Optional[int] = None,
+    llm_workers: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Generate a commit message for every repo, yielding results in
+    completion order. The last item is a summary:
+    {"done": True, "count", "ok", "failed", "totalMs"}.
+
+    `defaults` (commitType, diffMode, customMessage, noCache, deadline)
+    apply to repos that don't set them. Malformed specs raise ValueError
+    before anything runs (see normalize_repos); a repo that fails, e.g. a
+    path that doesn't exist, yields {"projectDir", "ok": False, "error"}
+    instead of stopping the batch.
+    """
+    items = normalize_repos(repos, defaults)
+    start = time.perf_counter()
+    ok = failed = 0
+    if items:
+        results: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        n_scan = max(1, min(len(items), scan_workers or DEFAULT_SCAN_WORKERS))
+        n_llm = max(1, min(len(items), llm_workers or DEFAULT_LLM_WORKERS))
+        # Leaving the block shuts the scan pool down first, then the LLM pool
+        with ThreadPoolExecutor(max_workers=n_llm, thread_name_prefix="batch-llm") as llm_pool, \
+                ThreadPoolExecutor(max_workers=n_scan, thread_name_prefix="batch-scan") as scan_pool:
+
+            def scan_then_queue(item: Dict[str, Any]) -> None:
+                out, scan = _scan_one(item)
+                if scan is None:
+                    results.put(out)
+                else:
+                    llm_pool.submit(lambda: results.put(_generate_one(out, scan)))
+
+            for item in items:
+                scan_pool.submit(scan_then_queue, item)
+            for _ in items:
+                res = results.get()
+                if res["ok"]:
+                    ok += 1
+                else:
+                    failed += 1
+                yield res
+
+    yield {
+        "done": True,
+        "count": len(items),
+        "ok": ok,
+        "failed": failed,
+        "totalMs": _ms(start, time.perf_counter()),
+    }
@@ -0,0 +1,220 @@
+"""
+chargrid.py
+
+Flat, array-backed 2D character grid used to composite ASCII scenes.
+
+A CharGrid keeps all cells in one `array` of unicode characters, so
+writing text or copying a sprite row is a slice assignment instead of the
+str -> list -> join round trip per touched row. The grid also keeps the
+string form of each row and only re-converts rows written since the last
+render, so a frame that changes a handful of rows pays for a handful.
+
+Run `python chargrid.py` for a frame-build benchmark against the
+list-of-strings approach at common and large terminal sizes.
+"""
+
+from __future__ import annotations
+
+import functools
+import sys
+from array import array
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+# "u" is deprecated from 3.13 on in favour of "w" (same semantics)
+_TYPECODE = "w" if sys.version_info >= (3, 13) else "u"
+
+
+@functools.lru_cache(maxsize=1024)
+def _opaque_runs(line: str, transparent: str) -> Tuple[Tuple[int, array], ...]:
+    """(offset, cells) of each run of non-`transparent` characters in a
+    sprite line. Sprites are redrawn every frame, so this is cached."""
+    runs = []
+    start = -1
+    for i, ch in enumerate(line + transparent):
+        if ch != transparent:
+            if start < 0:
+                start = i
+        elif start >= 0:
+            runs.append((start, array(_TYPECODE, line[start:i])))
+            start = -1
+    return tuple(runs)
+
+
+class CharGrid:
+    __slots__ = ("width", "height", "cells", "_rows")
+
+    def __init__(self, width: int, height: int, fill: str = " ") -> None:
+        self.width = max(0, width)
+        self.height = max(0, height)
+        blank = fill * self.width
+        self.cells = array(_TYPECODE, blank * self.height)
+        self._rows: List[Optional[str]] = [blank] * self.height  # None = stale
+
+    @classmethod
+    def from_lines(cls, lines: Sequence[str], width: Optional[int] = None, height: Optional[int] = None) -> "CharGrid":
+        """Grid of `lines`, each padded / clipped to `width` (default: longest)."""
+        w = width if width is not None else max((len(l) for l in lines), default=0)
+        h = height if height is not None else len(lines)
+        rows: List[Optional[str]] = [l[:w].ljust(w) for l in lines[:h]]
+        rows.extend(" " * w for _ in range(h - len(rows)))
+        grid = cls.__new__(cls)
+        grid.width, grid.height = w, h
+        grid.cells = array(_TYPECODE, "".join(rows))  # type: ignore[arg-type]
+        grid._rows = rows
+        return grid
+
+    def copy(self) -> "CharGrid":
+        grid = CharGrid.__new__(CharGrid)
+        grid.width, grid.height = self.width, self.height
+        grid.cells = self.cells[:]
+        grid._rows = list(self._rows)
+        return grid
+
+    # -- cell access -----------------------------------------------------
+
+    def get(self, x: int, y: int) -> str:
+        return self.cells[y * self.width + x]
+
+    def put(self, x: int, y: int, ch: str) -> None:
+        """Set one cell; out-of-bounds writes are ignored."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.cells[y * self.width + x] = ch
+            self._rows[y] = None
+
+    # -- compositing -----------------------------------------------------
+
+    def burn(self, x: int, y: int, text: str) -> None:
+        """Write `text` (spaces included) at (x, y), clipped to the grid."""
+        if not 0 <= y < self.height:
+            return
+        if x < 0:
+            text, x = text[-x:], 0
+        if len(text) > self.width - x:
+            text = text[: self.width - x]
+        if text:
+            base = y * self.width + x
+            self.cells[base:base + len(text)] = array(_TYPECODE, text)
+            self._rows[y] = None
+
+    def _burn_cells(self, x: int, y: int, cells: array) -> None:
+        n = len(cells)
+        if x < 0:
+            cells, n, x = cells[-x:], n + x, 0
+        n = min(n, self.width - x)
+        if n > 0:
+            base = y * self.width + x
+            self.cells[base:base + n] = cells[:n] if n < len(cells) else cells
+            self._rows[y] = None
+
+    def sprite(self, x: int, y: int, lines: Iterable[str], transparent: str = " ") -> None:
+        """Draw `lines` with `transparent` cells leaving the grid untouched."""
+        for dy, line in enumerate(lines):
+            row = y + dy
+            if row >= self.height:
+                break
+            if row < 0:
+                continue
+            # Copy each opaque run with one slice assignment
+            for offset, cells in _opaque_runs(line, transparent):
+                self._burn_cells(x + offset, row, cells)
+
+    def blit(self, src: "CharGrid", x: int, y: int, transparent: Optional[str] = None) -> None:
+        """Copy `src` onto this grid at (x, y), clipped. With `transparent`,
+        matching source cells are skipped."""
+        if transparent is not None:
+            self.sprite(x, y, src.lines(), transparent)
+            return
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.width, x + src.width), min(self.height, y + src.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        n = x1 - x0
+        for row in range(y0, y1):
+            s = (row - y) * src.width + (x0 - x)
+            d = row * self.width + x0
+            self.cells[d:d + n] = src.cells[s:s + n]
+            self._rows[row] = None
+
+    def region(self, x: int, y: int, width: int, height: int) -> "CharGrid":
+        """Copy of the (x, y, width, height) region (clipped; blank outside)."""
+        out = CharGrid(width, height)
+        out.blit(self, -x, -y)
+        return out
+
+    # -- output ----------------------------------------------------------
+
+    def row(self, y: int) -> str:
+        text = self._rows[y]
+        if text is None:
+            base = y * self.width
+            text = self._rows[y] = self.cells[base:base + self.width].tounicode()
+        return text
+
+    def lines(self) -> List[str]:
+        rows = self._rows
+        if None in rows:
+            cells, w = self.cells, self.width
+            for y, text in enumerate(rows):
+                if text is None:
+                    rows[y] = cells[y * w:(y + 1) * w].tounicode()
+        return list(rows)  # type: ignore[arg-type]
+
+    def __str__(self) -> str:
+        return "\n".join(self.lines())
+
+
+# ---------------------------------------------------------------------------
+# Benchmark: python chargrid.py
+# ---------------------------------------------------------------------------
+
+def _bench_lists(background: List[str], sprite: List[str], hud: List[str], w: int) -> str:
+    lines = list(background)
+    sx, sy = (w - len(sprite[0])) // 2, len(lines) // 3
+    for si, sline in enumerate(sprite):
+        row = list(lines[sy + si])
+        for ci, ch in enumerate(sline):
+            if ch != " ":
+                row[sx + ci] = ch
+        lines[sy + si] = "".join(row)
+    for y, text in ((0, " FL:3 backend/api | Lv4 Commit Squire | XP:812 "), (1, " Python Serpent  HP:31 [2/5] ")):
+        row = list(lines[y])
+        for i, ch in enumerate(text):
+            row[i] = ch
+        lines[y] = "".join(row)
+    return "\n".join(lines + ["═" * w] + hud)
+
+
+def _bench_grid(background: CharGrid, sprite: List[str], hud: CharGrid, h: int) -> str:
+    # `background` holds the corridor, separator and HUD area of the frame;
+    # a frame copies it, draws on the copy and renders the touched rows
+    grid = background.copy()
+    grid.sprite((grid.width - len(sprite[0])) // 2, h // 3, sprite)
+    grid.burn(0, 0, " FL:3 backend/api | Lv4 Commit Squire | XP:812 ")
+    grid.burn(0, 1, " Python Serpent  HP:31 [2/5] ")
+    grid.blit(hud, 0, h + 1)
+    return str(grid)
+
+
+def _benchmark() -> None:
+    import random
+    import timeit
+
+    rng = random.Random(7)
+    print(f"{'size':>9}  {'lists':>10}  {'chargrid':>10}  speedup")
+    for w, h in ((120, 40), (200, 60), (300, 90), (400, 120)):
+        bg_lines = ["".join(rng.choice(" |-=[]") for _ in range(w)) for _ in range(h)]
+        art = ["  /^\\/^\\  ", "_|__|  O| ", "\\/     /~/", " \\____/  \\", "  |  |    \\"]
+        sprite = ["".join(c * max(1, w * 35 // 100 // 10) for c in l) for l in art]
+        hud = [("/|  " * (w // 4)).ljust(w)[:w] for _ in range(9)]
+        bg_grid = CharGrid.from_lines(bg_lines + ["═" * w], w, h + 1 + len(hud))
+        hud_grid = CharGrid.from_lines(hud, w)
+
+        assert _bench_lists(bg_lines, sprite, hud, w) == _bench_grid(bg_grid, sprite, hud_grid, h)
+        n = 300
+        t_list = timeit.timeit(lambda: _bench_lists(bg_lines, sprite, hud, w), number=n) / n
+        t_grid = timeit.timeit(lambda: _bench_grid(bg_grid, sprite, hud_grid, h), number=n) / n
+        print(f"{w:>4}x{h:<4}  {t_list * 1e6:>8.0f}us  {t_grid * 1e6:>8.0f}us  {t_list / t_grid:>6.1f}x")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,140 @@
+"""
+combatlog.py
+
+Bounded, incremental combat log for the TUI.
+
+Each log entry is its own widget holding a rich Markdown renderable,
+parsed once when it is appended. Only the newest `max_entries` stay in
+memory and mounted (a ring buffer); with COMMIT_LOG_SPILL=<file> the
+entries that fall off are appended to that file so a long session's
+history isn't lost. Appending costs the same at entry 10 and at entry
+10,000, unlike re-rendering one Markdown document of the whole history.
+
+Run `python combatlog.py` for a per-append benchmark of both approaches.
+"""
+
+from __future__ import annotations
+
+import os
+from collections import deque
+from typing import Any, Deque, Optional
+
+from rich.markdown import Markdown
+from textual.containers import VerticalScroll
+from textual.widgets import Static
+
+# Entries kept (and mounted) in the log
+MAX_ENTRIES = int(os.getenv("COMMIT_LOG_MAX_ENTRIES", "200"))
+
+# File that evicted entries are appended to (unset: they are dropped)
+SPILL_PATH = os.getenv("COMMIT_LOG_SPILL") or None
+
+SEPARATOR = "\n\n---\n\n"
+
+
+class LogBuffer:
+    """Ring buffer of the newest entries; evicted ones go to `spill_path`."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, spill_path: Optional[str] = SPILL_PATH) -> None:
+        self.entries: Deque[str] = deque(maxlen=max(1, max_entries))
+        self.spill_path = spill_path
+        self.total = 0    # entries ever appended
+        self.spilled = 0  # entries written to spill_path
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def append(self, md: str) -> Optional[str]:
+        """Add an entry. Returns the entry it evicted, if any."""
+        evicted = self.entries[0] if len(self.entries) == self.entries.maxlen else None
+        self.entries.append(md)
+        self.total += 1
+        if evicted is not None and self.spill_path:
+            with open(self.spill_path, "a", encoding="utf-8") as fh:
+                fh.write(evicted + SEPARATOR)
+            self.spilled += 1
+        return evicted
+
+    def text(self) -> str:
+        """Retained entries as one Markdown document."""
+        return SEPARATOR.join(self.entries)
+
+
+class CombatLog(VerticalScroll):
+    """Scrolling log of Markdown entries backed by a LogBuffer."""
+
+    def __init__(
+        self,
+        max_entries: int = MAX_ENTRIES,
+        spill_path: Optional[str] = SPILL_PATH,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.buffer = LogBuffer(max_entries, spill_path)
+        # Mounted entry widgets, oldest first; removal is asynchronous, so
+        # `children[0]` may be one that is already on its way out
+        self._mounted: Deque[Static] = deque()
+
+    def append(self, md: str) -> None:
+        """Mount `md` as a new entry (dropping the oldest past the cap) and
+        follow the end of the log."""
+        if self.buffer.append(md) is not None and self._mounted:
+            self._mounted.popleft().remove()
+        widget = Static(Markdown(md), classes="entry")
+        self._mounted.append(widget)
+        self.mount(widget)
+        self.scroll_end(animate=False)
+
+    def text(self) -> str:
+        return self.buffer.text()
+
+
+# ---------------------------------------------------------------------------
+# Benchmark: python combatlog.py
+# ---------------------------------------------------------------------------
+
+def _benchmark() -> None:
+    import asyncio
+    import time
+
+    from textual.app import App, ComposeResult
+    from textual.widgets import Markdown as MarkdownWidget
+
+    entry = "### ⚔️ You swing at `Python Serpent`\n\n- **Damage:** `17`\n- **HP left:** `3`"
+    batch = 500
+
+    class Bench(App[None]):
+        def compose(self) -> ComposeResult:
+            yield CombatLog(id="log")
+            with VerticalScroll(id="old"):
+                yield MarkdownWidget("", id="old_md")
+
+    async def run() -> None:
+        app = Bench()
+        async with app.run_test(size=(120, 40)) as pilot:
+            # Whole-history document: one append re-renders all n entries
+            # (too slow to take anywhere near 10k)
+            old = app.query_one("#old_md", MarkdownWidget)
+            print("whole-history Markdown, per append:")
+            for n in (10, 50, 100):
+                t0 = time.perf_counter()
+                await old.update(SEPARATOR.join([entry] * n))
+                await pilot.pause()
+                print(f"  {n:>6} entries  {(time.perf_counter() - t0) * 1e3:>9.2f}ms")
+            await old.update("")
+
+            log = app.query_one(CombatLog)
+            print(f"CombatLog (max {log.buffer.entries.maxlen} entries), per append:")
+            for upto in range(batch, 10_000 + 1, batch):
+                t0 = time.perf_counter()
+                for _ in range(batch):
+                    log.append(entry)
+                await pilot.pause()
+                if upto in (500, 1_000, 2_500, 5_000, 7_500, 10_000):
+                    print(f"  {upto:>6} entries  {(time.perf_counter() - t0) / batch * 1e3:>9.2f}ms")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    _benchmark()
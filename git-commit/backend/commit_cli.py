@@ -1,20 +1,26 @@
 from __future__ import annotations
 
 import argparse
+import json
 import os
 import sys
 from pathlib import Path
 from typing import Any, Dict, Optional
 
+from batch import iter_batch
 from commit_core import (
+    compose_commit_message,
     ensure_git_repo,
     ensure_project_dir,
-    generate_commit_message,
     get_changes_summary,
     load_config,
     maybe_auto_commit,
     save_config,
+    warm_up_model,
 )
+from metrics import collect, format_breakdown
+from response_cache import get_response_cache
+import tracing
 
 DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "qwen3:1.7b")
 
@@ -41,6 +47,15 @@ def cmd_setup(args: argparse.Namespace) -> int:
 
 
 def cmd_generate(args: argparse.Namespace) -> int:
+    with collect() as timings:
+        code = _generate(args)
+    if args.timings and timings:
+        print("\n--- Timings ---")
+        print(format_breakdown(timings))
+    return code
+
+
+def _generate(args: argparse.Namespace) -> int:
     project_dir = ensure_project_dir(args.project_dir)
 
     config = load_config(project_dir)
@@ -53,6 +68,10 @@ def cmd_generate(args: argparse.Namespace) -> int:
         _print_err("No git repository found in projectDir.")
         return 2
 
+    # Load the model while git computes the diff
+    if args.warm_up and not args.message:
+        warm_up_model(config)
+
     diff_mode = "staged" if args.staged else "unstaged"
     summary = get_changes_summary(repo, mode=diff_mode)
     diff_summary = summary["summary_text"] if summary["files"] else "general updates"
@@ -60,15 +79,22 @@ def cmd_generate(args: argparse.Namespace) -> int:
     commit_type = (args.type or "chore").strip()
     custom_message = (args.message or "").strip()
 
-    commit_message = generate_commit_message(
+    result = compose_commit_message(
         commit_type=commit_type,
         custom_message=custom_message,
         config=config,
         diff_summary=diff_summary,
+        summary=summary,
+        cache=None if args.no_cache else get_response_cache(project_dir),
+        deadline=args.deadline,
     )
+    commit_message = result["message"]
 
     print("\n--- Commit Message ---")
     print(commit_message)
+    print(f"(source: {result['source']})")
+    if result.get("error"):
+        print(f"LLM error: {result['error']}", file=sys.stderr)
     print("\n--- Stats ---")
     print(f"Mode: {summary['mode']}")
     print(f"Files changed: {len(summary['files'])}")
@@ -78,18 +104,51 @@ def cmd_generate(args: argparse.Namespace) -> int:
     print(f"Enemies slain: {len(summary['files'])}")
 
     if args.auto_commit:
-        result = maybe_auto_commit(repo, commit_message, stage_all=True)
+        auto_commit_result = maybe_auto_commit(repo, commit_message, stage_all=True)
         print("\n--- Auto-Commit ---")
-        print(result)
+        print(auto_commit_result)
 
     return 0
 
 
+def cmd_batch(args: argparse.Namespace) -> int:
+    dirs = list(args.project_dirs)
+    if args.file:
+        try:
+            if args.file == "-":
+                lines = sys.stdin.readlines()
+            else:
+                with open(args.file, encoding="utf-8") as fh:
+                    lines = fh.readlines()
+        except OSError as e:
+            _print_err(f"Cannot read repo list {args.file}: {e.strerror or e}")
+            return 2
+        dirs += [ln.strip() for ln in lines if ln.strip() and not ln.lstrip().startswith("#")]
+    if not dirs:
+        _print_err("No repositories given. Pass paths or --file <list>.")
+        return 2
+
+    defaults: Dict[str, Any] = {
+        "commitType": (args.type or "chore").strip(),
+        "diffMode": "staged" if args.staged else "unstaged",
+        "noCache": args.no_cache,
+        "deadline": args.deadline,
+    }
+
+    failed = 0
+    for res in iter_batch(dirs, defaults, scan_workers=args.scan_workers, llm_workers=args.llm_workers):
+        if res.get("done"):
+            failed = res["failed"]
+        print(json.dumps(res), flush=True)
+    return 1 if failed else 0
+
+
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(
         prog="commit-cli",
         description="Ollama-only AI commit message generator (uses local Git diffs).",
     )
+    p.add_argument("--trace", default=None, help="Write a Chrome trace (Perfetto) of this run to a file.")
     sub = p.add_subparsers(dest="cmd", required=True)
 
     # setup
@@ -108,15 +167,39 @@ def build_parser() -> argparse.ArgumentParser:
     g.add_argument("--message", default="", help="Custom message override. If provided, AI is skipped.")
     g.add_argument("--staged", action="store_true", help="Use staged changes (git diff --cached). Default is unstaged.")
     g.add_argument("--auto-commit", action="store_true", help="Automatically commit with the generated message.")
+    g.add_argument("--no-cache", action="store_true", help="Bypass the LLM response cache and always ask the model.")
+    g.add_argument("--deadline", type=float, default=None, help="Seconds to wait for the model before using the offline generator.")
+    g.add_argument("--warm-up", action="store_true", help="Preload the Ollama model in the background while scanning.")
+    g.add_argument("--timings", action="store_true", help="Print a per-stage timing breakdown.")
     g.set_defaults(func=cmd_generate)
 
+    # batch
+    b = sub.add_parser("batch", help="Generate commit messages for many repos; prints JSON lines.")
+    b.add_argument("project_dirs", nargs="*", help="Paths to git repos")
+    b.add_argument("--file", default=None, help="File with one repo path per line ('-' for stdin)")
+    b.add_argument("--type", default="chore", help="Conventional commit type for every repo")
+    b.add_argument("--staged", action="store_true", help="Use staged changes. Default is unstaged.")
+    b.add_argument("--no-cache", action="store_true", help="Bypass the LLM response cache.")
+    b.add_argument("--deadline", type=float, default=None, help="Per-repo seconds to wait for the model before the offline generator.")
+    b.add_argument("--scan-workers", type=int, default=None, help="Parallel repo scans (default: based on CPU count)")
+    b.add_argument("--llm-workers", type=int, default=None, help="Concurrent LLM calls (default: BATCH_LLM_WORKERS or 2)")
+    b.set_defaults(func=cmd_batch)
+
     return p
 
 
 def main(argv: Optional[list[str]] = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
-    return int(args.func(args))
+    if args.trace:
+        tracing.start(args.trace)
+    try:
+        with tracing.trace_span(f"commit-cli {args.cmd}", "cli"):
+            return int(args.func(args))
+    finally:
+        path = tracing.stop()
+        if path:
+            _print_err(f"Trace written to {path}")
 
 
 if __name__ == "__main__":
@@ -1,18 +1,52 @@
 from __future__ import annotations
 
+import contextvars
 import json
 import os
 import re
 import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 from git import InvalidGitRepositoryError, Repo
 
-from llm_provider import generate_with_provider
+from fallback import local_commit_message
+from git_index import changed_paths
+from llm_provider import (
+    LLM_MAX_CONCURRENCY,
+    DaemonExecutor,
+    agenerate,
+    generate_with_provider,
+    model_status,
+    warm_up,
+)
+from metrics import span
+from response_cache import ResponseCache
+from repo_state import worktree_fingerprint
 
 CONFIG_FILE = "project_config.json"
 
+# Seconds to wait for the LLM before using the local fallback generator
+DEFAULT_LLM_DEADLINE = float(os.getenv("COMMIT_LLM_DEADLINE", "30"))
+
+# Runs deadline-bound LLM calls; a late call finishes here in the background
+# without holding up exit. At least LLM_MAX_CONCURRENCY workers, so
+# concurrent requests don't queue behind each other (COMMIT_LLM_WORKERS
+# raises it further).
+_LLM_EXECUTOR = DaemonExecutor(
+    max(LLM_MAX_CONCURRENCY, int(os.getenv("COMMIT_LLM_WORKERS", "0"))),
+    thread_name_prefix="commit-llm",
+)
+
+# Detect unstaged candidates by reading .git/index in-process (see git_index.py)
+USE_INDEX_READER = os.getenv("COMMIT_INDEX_READER", "1") != "0"
+
+# Above this many candidate paths a full diff is cheaper than a long pathspec
+_PATHSPEC_LIMIT = 512
+
 # Conventional Commits types we accept/normalize to.
 ALLOWED_TYPES = {
     "feat",
@@ -87,13 +121,14 @@ def ensure_git_repo(project_dir: str) -> Optional[Repo]:
     """
     Non-interactive: return Repo if valid, else None.
     """
-    try:
-        repo = Repo(project_dir, search_parent_directories=True)
-        if repo.bare:
+    with span("repo_open"):
+        try:
+            repo = Repo(project_dir, search_parent_directories=True)
+            if repo.bare:
+                return None
+            return repo
+        except InvalidGitRepositoryError:
             return None
-        return repo
-    except InvalidGitRepositoryError:
-        return None
 
 
 def _run(repo: Repo, args: List[str]) -> str:
@@ -111,81 +146,241 @@ def _run(repo: Repo, args: List[str]) -> str:
     return res.stdout
 
 
+def _stream(repo: Repo, args: List[str], sep: str = "\0", chunk_size: int = 65536) -> Iterator[str]:
+    """
+    Run a git command and yield its stdout split on `sep`, as it arrives.
+    """
+    cwd = repo.working_tree_dir or "."
+    proc = subprocess.Popen(
+        ["git", *args],
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    assert proc.stdout is not None
+    buf = ""
+    try:
+        while True:
+            chunk = proc.stdout.read(chunk_size)
+            if not chunk:
+                break
+            buf += chunk
+            *tokens, buf = buf.split(sep)
+            yield from tokens
+        if buf:
+            yield buf
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+
 def _diff_mode_args(mode: str) -> List[str]:
     # staged => --cached
     return ["--cached"] if mode == "staged" else []
 
 
-def get_changes_summary(repo: Repo, mode: str = "unstaged") -> Dict[str, Any]:
+class FileChange(NamedTuple):
+    path: str
+    insertions: int
+    deletions: int
+    old_path: Optional[str] = None  # set for renames/copies
+    binary: bool = False
+
+
+def iter_diff(repo: Repo, mode: str = "unstaged", paths: Optional[List[str]] = None) -> Iterator[FileChange]:
+    """
+    Stream per-file changes from a single `git diff --numstat -z` run.
+
+    Record format (NUL-delimited):
+      <ins>\t<del>\t<path>\0                  regular change
+      <ins>\t<del>\t\0<old_path>\0<new_path>\0  rename / copy
+    Binary files report '-' for both counts.
+
+    `paths` restricts the diff to the given repo-relative paths.
+    """
+    args = ["diff", *_diff_mode_args(mode), "--numstat", "-z"]
+    if paths is not None:
+        args = ["--literal-pathspecs", *args, "--", *paths]
+    tokens = _stream(repo, args)
+    for record in tokens:
+        parts = record.split("\t", 2)
+        if len(parts) < 3:
+            continue
+
+        ins_s, del_s, path = parts
+        old_path: Optional[str] = None
+        if not path:
+            old_path = next(tokens, "")
+            path = next(tokens, "")
+            if not path:
+                continue
+
+        binary = ins_s == "-" and del_s == "-"
+        yield FileChange(
+            path=path,
+            insertions=int(ins_s) if ins_s.isdigit() else 0,
+            deletions=int(del_s) if del_s.isdigit() else 0,
+            old_path=old_path,
+            binary=binary,
+        )
+
+
+class SummaryCache:
+    """
+    LRU cache of change summaries keyed on (worktree, mode, fingerprint).
+
+    The fingerprint (see repo_state.worktree_fingerprint) covers the index,
+    HEAD and tracked-file stat data, so a hit means git would report the
+    same diff.
+    """
+
+    def __init__(self, max_entries: int = 32) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _copy_summary(summary)
+
+    def put(self, key: Tuple[str, str, str], summary: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = _copy_summary(summary)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def _copy_summary(summary: Dict[str, Any]) -> Dict[str, Any]:
+    # Callers mutate summaries (e.g. the TUI's mode switch); never share lists.
+    return {k: list(v) if isinstance(v, list) else v for k, v in summary.items()}
+
+
+SUMMARY_CACHE = SummaryCache(max_entries=int(os.getenv("COMMIT_SUMMARY_CACHE_SIZE", "32")))
+
+
+def repo_fingerprint(repo: Repo) -> str:
+    return worktree_fingerprint(str(repo.working_tree_dir or "."), str(repo.git_dir))
+
+
+def get_changes_summary(repo: Repo, mode: str = "unstaged", use_cache: bool = True) -> Dict[str, Any]:
     """
     Returns:
       - files: list[str]
       - insertions, deletions: int
+      - per_file: list[(path, insertions, deletions)]
+      - renames: list[(old_path, new_path)]
       - summary_text: str (compact natural-language summary)
+
+    Results are served from SUMMARY_CACHE while the repo fingerprint is
+    unchanged; pass use_cache=False to force a fresh diff.
     """
     mode = mode if mode in ("staged", "unstaged") else "unstaged"
-    extra = _diff_mode_args(mode)
+    if not use_cache:
+        return _compute_changes_summary(repo, mode)
 
-    # Files changed
-    name_only = _run(repo, ["diff", *extra, "--name-only"]).strip()
-    files: List[str] = [f for f in name_only.splitlines() if f.strip()]
+    with span("fingerprint") as attrs:
+        key = (str(repo.working_tree_dir or "."), mode, repo_fingerprint(repo))
+        cached = SUMMARY_CACHE.get(key)
+        attrs["cached"] = cached is not None
+    if cached is not None:
+        return cached
 
-    # Stats: use numstat for reliability
-    numstat = _run(repo, ["diff", *extra, "--numstat"]).strip()
-    insertions: int = 0
-    deletions: int = 0
-    per_file: List[Tuple[str, int, int]] = []
+    summary = _compute_changes_summary(repo, mode)
+    SUMMARY_CACHE.put(key, summary)
+    return summary
 
-    for line in numstat.splitlines():
-        # format: <ins>\t<del>\t<path>
-        parts = line.split("\t")
-        if len(parts) < 3:
-            continue
 
-        ins_s, del_s, path = parts[0], parts[1], parts[2]
+def _unstaged_candidates(repo: Repo) -> Optional[List[str]]:
+    """
+    Paths that may differ from the index, found by stat-ing tracked files
+    against .git/index without spawning git. None means "ask git".
+    """
+    if not USE_INDEX_READER or not repo.working_tree_dir:
+        return None
+    candidates = changed_paths(str(repo.working_tree_dir), str(repo.git_dir))
+    if candidates is None or len(candidates) > _PATHSPEC_LIMIT:
+        return None
+    return candidates
 
-        # binary files show '-' sometimes
-        ins: int = int(ins_s) if ins_s.isdigit() else 0
-        dels: int = int(del_s) if del_s.isdigit() else 0
 
-        insertions += ins
-        deletions += dels
-        per_file.append((path, ins, dels))
+def _compute_changes_summary(repo: Repo, mode: str) -> Dict[str, Any]:
+    files: List[str] = []
+    insertions: int = 0
+    deletions: int = 0
+    per_file: List[Tuple[str, int, int]] = []
+    renames: List[Tuple[str, str]] = []
+
+    with span("diff") as attrs:
+        # For unstaged diffs only files whose stat data changed need git at all.
+        paths = _unstaged_candidates(repo) if mode == "unstaged" else None
+
+        # One diff pass gives us names, stats, renames and binary flags.
+        changes = iter_diff(repo, mode, paths) if paths != [] else iter(())
+        for change in changes:
+            files.append(change.path)
+            insertions += change.insertions
+            deletions += change.deletions
+            per_file.append((change.path, change.insertions, change.deletions))
+            if change.old_path:
+                renames.append((change.old_path, change.path))
+        attrs["files"] = len(files)
 
     # Build a compact summary
-    if not files:
-        summary_text = "general updates"
-    else:
-        top: List[Tuple[str, int, int]] = per_file[:6]
-        chunks: List[str] = [f"{p} (+{ins}/-{dels})" for (p, ins, dels) in top]
-        suffix = "" if len(per_file) <= 6 else f" +{len(per_file) - 6} more files"
-        summary_text = f"Changed {len(files)} files: " + ", ".join(chunks) + suffix
+    with span("summary"):
+        if not files:
+            summary_text = "general updates"
+        else:
+            top = per_file[:6]
+            chunks: List[str] = [f"{p} (+{ins}/-{dels})" for (p, ins, dels) in top]
+            suffix = "" if len(files) <= 6 else f" +{len(files) - 6} more files"
+            summary_text = f"Changed {len(files)} files: " + ", ".join(chunks) + suffix
 
     return {
         "mode": mode,
         "files": files,
         "insertions": insertions,
         "deletions": deletions,
+        "per_file": per_file,
+        "renames": renames,
         "summary_text": summary_text,
     }
 
 
-def generate_commit_message(
-    commit_type: str,
-    custom_message: str,
-    config: Dict[str, Any],
-    diff_summary: str,
-) -> str:
-    commit_type = normalize_commit_type(commit_type)
-    if custom_message:
-        msg = " ".join(str(custom_message).strip().splitlines()).strip()
-        return f"{commit_type}: {msg}" if msg else f"{commit_type}: update project"
+def _opt_float(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# A model line that already is a Conventional Commit header
+_CONVENTIONAL_RE = re.compile(r"^[a-z]+(\([^)]+\))?:\s+\S")
 
+
+def _build_prompt(commit_type: str, config: Dict[str, Any], diff_summary: str) -> str:
     language = str(config.get("language", "Unknown"))
     framework = str(config.get("framework", "Unknown"))
     specialization = str(config.get("specialization", "Generalist"))
 
-    prompt = (
+    return (
         "You are a senior software engineer. Generate ONE concise git commit message.\n"
         "Rules:\n"
         "- Use Conventional Commits EXACTLY: <type>: <summary>\n"
@@ -197,12 +392,36 @@ def generate_commit_message(
         f"- diff summary: {diff_summary}\n"
     )
 
-    # Ollama-only defaults
-    provider = str(config.get("provider", "ollama"))
-    model = str(config.get("model", os.getenv("OLLAMA_MODEL", "qwen3:1.7b")))
 
-    msg = generate_with_provider(prompt, provider=provider, model=model)
+def _provider_kwargs(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Keyword arguments for generate_with_provider derived from config."""
+    return {
+        # Ollama-only defaults
+        "provider": str(config.get("provider", "ollama")),
+        "model": str(config.get("model", os.getenv("OLLAMA_MODEL", "qwen3:1.7b"))),
+        # Streaming lets us stop the model after the one line we keep.
+        # Extra provider options (num_predict, stop, temperature...) come from config.
+        "options": dict(config.get("options") or {}),
+        "stream": bool(config.get("stream", True)),
+        "first_line": True,
+        "connect_timeout": _opt_float(config.get("connect_timeout")),
+        "read_timeout": _opt_float(config.get("read_timeout")),
+        "keep_alive": config.get("keep_alive"),
+    }
+
+
+def warm_up_model(config: Dict[str, Any], background: bool = True) -> Optional[threading.Thread]:
+    """Preload the configured model (see llm_provider.warm_up)."""
+    kw = _provider_kwargs(config)
+    return warm_up(kw["model"], provider=kw["provider"], keep_alive=kw["keep_alive"], background=background)
+
+
+def model_warmth(config: Dict[str, Any]) -> str:
+    """cold / warming / warm / failed (...) for the configured model."""
+    return model_status(str(config.get("model", os.getenv("OLLAMA_MODEL", "qwen3:1.7b"))))
 
+
+def _clean_message(commit_type: str, msg: str) -> str:
     # Hard clean-up: keep first line, enforce type prefix
     lines = (msg or "").strip().splitlines()
     first = lines[0].strip() if lines else ""
@@ -225,11 +444,129 @@ def generate_commit_message(
     return first[:72].strip()
 
 
+def llm_deadline(config: Dict[str, Any]) -> float:
+    """Deadline for the LLM path: config "llm_deadline" or COMMIT_LLM_DEADLINE."""
+    deadline = _opt_float(config.get("llm_deadline"))
+    return DEFAULT_LLM_DEADLINE if deadline is None else deadline
+
+
+def compose_commit_message(
+    commit_type: str,
+    custom_message: str,
+    config: Dict[str, Any],
+    diff_summary: str,
+    summary: Optional[Dict[str, Any]] = None,
+    cache: Optional[ResponseCache] = None,
+    deadline: Optional[float] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+) -> Dict[str, str]:
+    """
+    Produce a commit message and report which path made it.
+
+    Returns {"message": ..., "source": "custom" | "llm" | "fallback"}.
+    The LLM gets `deadline` seconds (default: llm_deadline(config)),
+    counted from submission, so time spent waiting for a free worker is
+    part of it; if it is late or fails, the message comes from
+    fallback.local_commit_message built from `summary`. A provider failure
+    (as opposed to a timeout) is also reported as "error". `on_token`
+    receives streamed model output.
+    """
+    commit_type = normalize_commit_type(commit_type)
+    if custom_message:
+        custom = " ".join(str(custom_message).strip().splitlines()).strip()
+        return {
+            "message": f"{commit_type}: {custom}" if custom else f"{commit_type}: update project",
+            "source": "custom",
+        }
+
+    with span("prompt"):
+        prompt = _build_prompt(commit_type, config, diff_summary)
+
+    def call() -> str:
+        return generate_with_provider(prompt, cache=cache, on_token=on_token, **_provider_kwargs(config))
+
+    # copy_context() carries the caller's metrics collector into the worker
+    future = _LLM_EXECUTOR.submit(contextvars.copy_context().run, call)
+    msg: Optional[str]
+    error: Optional[str] = None
+    with span("generate") as attrs:
+        try:
+            msg = future.result(timeout=deadline if deadline is not None else llm_deadline(config))
+        except FutureTimeoutError:
+            future.cancel()  # still queued behind late calls: never start it
+            attrs["fallback"] = "TimeoutError"
+            msg = None
+        except Exception as e:  # the provider failed: wrong model, auth, bad host...
+            error = f"{e.__class__.__name__}: {e}"
+            attrs["fallback"] = e.__class__.__name__
+            attrs["error"] = error
+            msg = None
+    if msg is None:
+        with span("fallback"):
+            result = {"message": local_commit_message(commit_type, summary or {}), "source": "fallback"}
+        if error:
+            result["error"] = error
+        return result
+    with span("postprocess"):
+        return {"message": _clean_message(commit_type, msg), "source": "llm"}
+
+
+def generate_commit_message(
+    commit_type: str,
+    custom_message: str,
+    config: Dict[str, Any],
+    diff_summary: str,
+    cache: Optional[ResponseCache] = None,
+    summary: Optional[Dict[str, Any]] = None,
+) -> str:
+    return compose_commit_message(
+        commit_type, custom_message, config, diff_summary, summary=summary, cache=cache
+    )["message"]
+
+
+async def agenerate_commit_messages(
+    commit_type: str,
+    config: Dict[str, Any],
+    diff_summary: str,
+    n: int = 3,
+    deadline: Optional[float] = None,
+    first_valid: bool = False,
+    cache: Optional[ResponseCache] = None,
+) -> List[str]:
+    """
+    Generate up to `n` candidate commit messages concurrently.
+
+    With `first_valid`, returns as soon as one candidate is already a
+    Conventional Commit line. Candidates still running at `deadline`
+    seconds are dropped. Results are cleaned and de-duplicated, in
+    completion order; an empty list means nothing arrived in time.
+    """
+    commit_type = normalize_commit_type(commit_type)
+    prompt = _build_prompt(commit_type, config, diff_summary)
+
+    raw = await agenerate(
+        prompt,
+        n=n,
+        deadline=deadline,
+        validate=(lambda line: bool(_CONVENTIONAL_RE.match(line))) if first_valid else None,
+        cache=cache,
+        **_provider_kwargs(config),
+    )
+
+    out: List[str] = []
+    for msg in raw:
+        cleaned = _clean_message(commit_type, msg)
+        if cleaned not in out:
+            out.append(cleaned)
+    return out
+
+
 def maybe_auto_commit(repo: Repo, message: str, stage_all: bool = True) -> str:
-    try:
-        if stage_all:
-            repo.git.add(A=True)
-        repo.index.commit(message)
-        return "Changes committed automatically."
-    except Exception as e:
-        return f"Auto-commit failed: {e}"
\ No newline at end of file
+    with span("commit"):
+        try:
+            if stage_all:
+                repo.git.add(A=True)
+            repo.index.commit(message)
+            return "Changes committed automatically."
+        except Exception as e:
+            return f"Auto-commit failed: {e}"
\ No newline at end of file
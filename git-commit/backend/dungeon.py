@@ -1,9 +1,18 @@
 from __future__ import annotations
 
+import functools
 import hashlib
+import os
 import random
-from pathlib import Path
-from typing import Dict, List, Tuple
+import subprocess
+import threading
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from chargrid import CharGrid
+from pathtrie import PathTrie
+from repo_state import find_git_dir
+from tracing import traced
 
 # ---------------------------------------------------------------------------
 # Filesystem scanning
@@ -16,31 +25,273 @@ _SKIP_NAMES = {
 }
 
 
-def build_dungeon(repo_path: str) -> Dict[str, List[str]]:
+# A directory modified this close to when it was listed may have changed
+# again within the same mtime tick; such listings are not trusted.
+_RACY_NS = 1_000_000_000
+
+
+class _DirListing(NamedTuple):
+    mtime_ns: int
+    listed_ns: int
+    files: Tuple[str, ...]    # regular files (names)
+    subdirs: Tuple[str, ...]  # subdirectories kept after pruning (names)
+
+
+class DungeonIndex:
+    """Incrementally maintained room -> files index of one repo.
+
+    Directories are listed with os.scandir and noise directories are pruned
+    before descending. Each listing is kept with the directory's mtime; a
+    refresh only stats directories and re-lists those whose mtime changed
+    (adding, removing or renaming an entry bumps its parent's mtime), and
+    rooms with no re-listed directory keep their previous file list.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+        self._dirs: Dict[str, _DirListing] = {}  # relative path ("" = root)
+        self._rooms: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self.scanned = 0  # directories listed by the last refresh
+        self.reused = 0   # directories revalidated by mtime alone
+
+    def _listing(self, rel: str, top: bool = False) -> Optional[_DirListing]:
+        path = os.path.join(self.root, rel) if rel else self.root
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        cached = self._dirs.get(rel)
+        if cached is not None and cached.mtime_ns == mtime_ns and cached.listed_ns - mtime_ns > _RACY_NS:
+            self.reused += 1
+            return cached
+
+        listed_ns = time.time_ns()
+        files: List[str] = []
+        subdirs: List[str] = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    name = entry.name
+                    if name in _SKIP_NAMES:
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not (top and name.startswith(_SKIP_PREFIXES)):
+                                subdirs.append(name)
+                        elif entry.is_file():
+                            files.append(name)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+
+        self.scanned += 1
+        listing = _DirListing(mtime_ns, listed_ns, tuple(files), tuple(subdirs))
+        self._dirs[rel] = listing
+        return listing
+
+    def refresh(self) -> Dict[str, List[str]]:
+        """Revalidate against the filesystem and return the rooms.
+
+        Same shape as build_dungeon; the lists are shared with the index
+        and must not be mutated.
+        """
+        with self._lock:
+            self.scanned = self.reused = 0
+            seen = {""}
+            root = self._listing("", top=True)
+            rooms: Dict[str, List[str]] = {}
+            for name in sorted(root.subdirs if root else (), key=str.lower):
+                before = self.scanned
+                files: List[str] = []
+                complete = True
+                stack = [name]
+                while stack:
+                    rel = stack.pop()
+                    listing = self._listing(rel)
+                    if listing is None:
+                        complete = False
+                        continue
+                    seen.add(rel)
+                    files.extend(os.path.join(rel, f) for f in listing.files)
+                    stack.extend(os.path.join(rel, d) for d in listing.subdirs)
+
+                previous = self._rooms.get(name)
+                if previous is not None and complete and self.scanned == before:
+                    rooms[name] = previous
+                else:
+                    files.sort()
+                    rooms[name] = files
+
+            # Forget directories that no longer exist (or are now pruned)
+            for rel in [r for r in self._dirs if r not in seen]:
+                del self._dirs[rel]
+            self._rooms = rooms
+            return dict(rooms)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"dirs": len(self._dirs), "scanned": self.scanned, "reused": self.reused}
+
+
+_INDEXES: Dict[str, DungeonIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_dungeon_index(repo_path: str) -> DungeonIndex:
+    """Return the process-wide index for `repo_path`."""
+    key = os.path.abspath(repo_path)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = _INDEXES[key] = DungeonIndex(key)
+        return index
+
+
+# ---------------------------------------------------------------------------
+# Git-backed rooms
+# ---------------------------------------------------------------------------
+
+# Where rooms come from: "git" (tracked files), "git+untracked" (plus
+# untracked files that are not ignored) or "fs" (walk the working tree).
+DUNGEON_SOURCE = os.getenv("COMMIT_DUNGEON_SOURCE", "git")
+
+# (abs path, include_untracked) -> (index stat, rooms); tracked-only lists
+# stay valid until the index file changes
+_GIT_ROOMS: Dict[Tuple[str, bool], Tuple[Tuple[int, int], Dict[str, List[str]]]] = {}
+_GIT_ROOMS_LOCK = threading.Lock()
+
+
+def _index_key(git_dir: Optional[str]) -> Optional[Tuple[int, int]]:
+    if git_dir is None:
+        return None
+    try:
+        st = os.stat(os.path.join(git_dir, "index"))
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _git_rooms(repo_path: str, include_untracked: bool) -> Optional[Dict[str, List[str]]]:
+    """Group `git ls-files` output by top-level folder in one streamed pass.
+
+    Paths are relative to `repo_path`. Skip-worktree entries (outside a
+    sparse checkout) and paths through a _SKIP_NAMES directory (a committed
+    node_modules, say) are left out, as the filesystem walk does. Returns
+    None when git can't list the directory (not a repo, git missing).
+    """
+    args = ["git", "ls-files", "-z", "-t"]
+    if include_untracked:
+        args += ["--cached", "--others", "--exclude-standard"]
+    try:
+        proc = subprocess.Popen(
+            args,
+            cwd=repo_path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+    except OSError:
+        return None
+    assert proc.stdout is not None
+
+    rooms: Dict[str, List[str]] = {}
+    buf = b""
+    try:
+        while True:
+            chunk = proc.stdout.read(65536)
+            if not chunk:
+                break
+            *records, buf = (buf + chunk).split(b"\0")
+            for record in records:
+                # "<tag> <path>"; S = skip-worktree (not checked out)
+                if len(record) < 3 or record[:1] == b"S":
+                    continue
+                path = os.fsdecode(record[2:])
+                top, sep, _ = path.partition("/")
+                if not sep or top.startswith(_SKIP_PREFIXES):
+                    continue
+                if not _SKIP_NAMES.isdisjoint(path.split("/")):
+                    continue
+                rooms.setdefault(top, []).append(path if os.sep == "/" else path.replace("/", os.sep))
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        return None
+
+    if include_untracked:  # tracked and untracked come out as two sorted runs
+        for files in rooms.values():
+            files.sort()
+    return {name: rooms[name] for name in sorted(rooms, key=str.lower)}
+
+
+def build_git_dungeon(repo_path: str, include_untracked: bool = False) -> Optional[Dict[str, List[str]]]:
+    """Rooms from git's file list (cached on the index stat when tracked-only)."""
+    key = (os.path.abspath(repo_path), include_untracked)
+    index_key = None if include_untracked else _index_key(find_git_dir(repo_path))
+    if index_key is not None:
+        with _GIT_ROOMS_LOCK:
+            cached = _GIT_ROOMS.get(key)
+        if cached is not None and cached[0] == index_key:
+            return dict(cached[1])
+
+    rooms = _git_rooms(repo_path, include_untracked)
+    if rooms is not None and index_key is not None:
+        with _GIT_ROOMS_LOCK:
+            _GIT_ROOMS[key] = (index_key, rooms)
+        return dict(rooms)
+    return rooms
+
+
+@traced(cat="dungeon")
+def build_dungeon(repo_path: str, source: Optional[str] = None) -> Dict[str, List[str]]:
     """Build a dungeon map from the top-level folders of a repo.
 
     Returns an alphabetically-sorted dict mapping folder name to list of
-    relative file paths beneath it.  Hidden and noise directories are skipped.
+    relative file paths beneath it.  Hidden folders are skipped.
+
+    `source` (default COMMIT_DUNGEON_SOURCE) picks the file list: "git"
+    uses tracked files, so .gitignore and sparse checkouts are respected;
+    "git+untracked" adds untracked, non-ignored files; "fs" walks the
+    working tree through a cached DungeonIndex (noise directories pruned).
+    Git sources fall back to "fs" outside a repository.
     """
-    root = Path(repo_path)
-    dungeon: Dict[str, List[str]] = {}
-
-    for item in sorted(root.iterdir(), key=lambda p: p.name.lower()):
-        if not item.is_dir():
-            continue
-        if item.name.startswith(_SKIP_PREFIXES) or item.name in _SKIP_NAMES:
-            continue
-
-        files: List[str] = sorted(
-            str(f.relative_to(root))
-            for f in item.rglob("*")
-            if f.is_file()
-            and f.name not in _SKIP_NAMES
-            and not any(part in _SKIP_NAMES for part in f.parts)
-        )
-        dungeon[item.name] = files
+    source = (source or DUNGEON_SOURCE).strip().lower()
+    if source in ("git", "git+untracked"):
+        rooms = build_git_dungeon(repo_path, include_untracked=source == "git+untracked")
+        if rooms is not None:
+            return rooms
+    return get_dungeon_index(repo_path).refresh()
+
 
-    return dungeon
+# Last (rooms, trie) pair; the room lists are kept so `is` checks are safe
+_ROOM_TRIE: Optional[Tuple[List[Tuple[str, List[str]]], PathTrie]] = None
+_ROOM_TRIE_LOCK = threading.Lock()
+
+
+def room_trie(dungeon: Dict[str, List[str]]) -> PathTrie:
+    """Trie over every artifact of `dungeon`, for rooms at any depth.
+
+    build_dungeon hands back the same file lists while nothing changed, so
+    the trie is rebuilt only when a room's list is a different object.
+    """
+    global _ROOM_TRIE
+    rooms = list(dungeon.items())
+    with _ROOM_TRIE_LOCK:
+        if _ROOM_TRIE is not None:
+            prev_rooms, trie = _ROOM_TRIE
+            if len(prev_rooms) == len(rooms) and all(
+                a == c and b is d for (a, b), (c, d) in zip(prev_rooms, rooms)
+            ):
+                return trie
+        trie = PathTrie()
+        for _, files in rooms:
+            for f in files:
+                trie.add(f if os.sep == "/" else f.replace(os.sep, "/"))
+        _ROOM_TRIE = (rooms, trie)
+        return trie
 
 
 # ---------------------------------------------------------------------------
@@ -105,6 +356,7 @@ _FOLDER_THEMES: Dict[str, str] = {
 }
 
 
+@functools.lru_cache(maxsize=4096)
 def lore_name(folder: str, commit_type: str = "chore") -> str:
     """Return a deterministic fantasy room name for a folder + commit type.
 
@@ -113,7 +365,7 @@ def lore_name(folder: str, commit_type: str = "chore") -> str:
         lore_name("backend", "feat")  ->  "Arcane Nexus (backend)"
         lore_name("tests",   "fix")   ->  "Broken Crypt (tests)"
     """
-    theme = _FOLDER_THEMES.get(folder.lower(), commit_type.lower())
+    theme = _FOLDER_THEMES.get(folder.rsplit("/", 1)[-1].lower(), commit_type.lower())
     adjs, nouns = _LORE_PARTS.get(theme, _DEFAULT_LORE)
     seed = int(hashlib.md5(f"{folder}:{theme}".encode()).hexdigest()[:8], 16)
     rng  = random.Random(seed)
@@ -200,38 +452,38 @@ def render_room(
     vs ``fix`` gives it a different feel.
 
     The lore name is burned into the top border; artifact count into
-    the bottom border.
+    the bottom border. Output is memoized in a bounded LRU cache (see
+    render_cache_stats).
     """
-    rng   = random.Random(int(hashlib.sha256(f"{folder}:{commit_type}".encode()).hexdigest()[:8], 16))
-    lines = _ROOM_STYLES[rng.randint(0, len(_ROOM_STYLES) - 1)](width, height)
+    return _render_room(folder, commit_type, width, height, len(files))
+
+
+# Rooms only depend on (folder, commit_type, width, height, file count)
+RENDER_CACHE_SIZE = int(os.getenv("DUNGEON_RENDER_CACHE_SIZE", "1024"))
 
-    # Normalise to height rows of width chars
-    while len(lines) < height:
-        lines.append(" " * width)
-    lines = [l.ljust(width)[:width] for l in lines[:height]]
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _render_room(folder: str, commit_type: str, width: int, height: int, count: int) -> str:
+    rng   = random.Random(int(hashlib.sha256(f"{folder}:{commit_type}".encode()).hexdigest()[:8], 16))
+    # Normalised to height rows of width chars
+    grid  = CharGrid.from_lines(_ROOM_STYLES[rng.randint(0, len(_ROOM_STYLES) - 1)](width, height), width, height)
 
     # Burn lore name into top border
     name  = lore_name(folder, commit_type)
     label = f"[ {name} ]"
     if len(label) <= width - 4:
-        sx  = (width - len(label)) // 2
-        row = list(lines[0])
-        for i, ch in enumerate(label):
-            row[sx + i] = ch
-        lines[0] = "".join(row)
+        grid.burn((width - len(label)) // 2, 0, label)
 
     # Scatter floor debris — density proportional to file count
-    n_items = min(8, max(1, len(files) // 3))
+    n_items = min(8, max(1, count // 3))
     for _ in range(n_items):
         r = rng.randint(2, height - 3)
         c = rng.randint(3, width - 4)
-        row = list(lines[r])
-        if row[c] == " ":
-            row[c] = rng.choice(_DEBRIS)
-            lines[r] = "".join(row)
+        if grid.get(c, r) == " ":
+            grid.put(c, r, rng.choice(_DEBRIS))
 
     # Wall decorations (torches / symbols) at 1/3 and 2/3 height
-    theme         = _FOLDER_THEMES.get(folder.lower(), commit_type.lower())
+    theme         = _FOLDER_THEMES.get(folder.rsplit("/", 1)[-1].lower(), commit_type.lower())
     left_d, right_d = _TORCH.get(theme, ("}", "{"))
 
     for torch_row, col, deco in [
@@ -239,31 +491,70 @@ def render_room(
         ((height * 2) // 3, width - 2, right_d),
     ]:
         if 1 <= torch_row <= height - 2:
-            row = list(lines[torch_row])
-            row[col] = deco
-            lines[torch_row] = "".join(row)
+            grid.put(col, torch_row, deco)
 
     # Burn artifact count into bottom border
-    count = len(files)
     word  = "artifact" if count == 1 else "artifacts"
     foot  = f"[ {count} {word} ]"
     if len(foot) <= width - 4:
-        sx  = (width - len(foot)) // 2
-        row = list(lines[-1])
-        for i, ch in enumerate(foot):
-            row[sx + i] = ch
-        lines[-1] = "".join(row)
+        grid.burn((width - len(foot)) // 2, height - 1, foot)
+
+    return str(grid)
 
-    return "\n".join(lines)
+
+def render_cache_stats() -> Dict[str, int]:
+    """Hit/miss counts of the room render cache."""
+    info = _render_room.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "entries": info.currsize, "maxsize": info.maxsize or 0}
 
 
 # ---------------------------------------------------------------------------
 # Map tree renderer
 # ---------------------------------------------------------------------------
 
+def iter_map_lines(
+    dungeon: Dict[str, List[str]],
+    commit_type: str = "chore",
+    start: int = 0,
+    limit: Optional[int] = None,
+) -> Iterator[str]:
+    """Yield the map tree for rooms[start:start + limit] line by line."""
+    rooms = list(dungeon.items())
+    end = len(rooms) if limit is None else min(len(rooms), start + limit)
+
+    for idx in range(start, end):
+        folder, files  = rooms[idx]
+        is_last        = idx == len(rooms) - 1
+        conn           = "└──" if is_last else "├──"
+        child_pfx      = "    " if is_last else "│   "
+
+        name  = lore_name(folder, commit_type)
+        count = len(files)
+        word  = "artifact" if count == 1 else "artifacts"
+        yield f"{conn} {name}  —  {count} {word}"
+
+        # Mini room preview (32 wide, 5 tall)
+        for preview_line in _render_room(folder, commit_type, 32, 5, count).splitlines():
+            yield f"{child_pfx}  {preview_line}"
+
+        # Up to 3 file names
+        visible   = files[:3]
+        truncated = len(files) - len(visible)
+        for fi, fname in enumerate(visible):
+            fc = "└──" if (fi == len(visible) - 1 and not truncated) else "├──"
+            yield f"{child_pfx}  {fc} {fname}"
+        if truncated:
+            yield f"{child_pfx}  └── … +{truncated} more"
+
+        if not is_last:
+            yield "│"
+
+
 def render_map(
     dungeon: Dict[str, List[str]],
     commit_type: str = "chore",
+    page: int = 1,
+    page_size: Optional[int] = None,
 ) -> str:
     """Render an ASCII tree of all dungeon rooms with lore names and mini previews.
 
@@ -281,37 +572,21 @@ def render_map(
         │
         └── Broken Crypt (tests)  —  1 artifact
               ...
+
+    With `page_size`, only that many rooms of page `page` (1-based) are
+    rendered and a footer points at the next page; use iter_map_lines to
+    stream the lines instead.
     """
     if not dungeon:
         return "DUNGEON MAP\n\n  (no rooms found)"
 
-    lines = ["DUNGEON MAP", "═" * 54]
-    rooms = list(dungeon.items())
-
-    for idx, (folder, files) in enumerate(rooms):
-        is_last        = idx == len(rooms) - 1
-        conn           = "└──" if is_last else "├──"
-        child_pfx      = "    " if is_last else "│   "
-
-        name  = lore_name(folder, commit_type)
-        count = len(files)
-        word  = "artifact" if count == 1 else "artifacts"
-        lines.append(f"{conn} {name}  —  {count} {word}")
-
-        # Mini room preview (32 wide, 5 tall)
-        for preview_line in render_room(folder, files, commit_type, width=32, height=5).splitlines():
-            lines.append(f"{child_pfx}  {preview_line}")
+    if page_size is None:
+        return "\n".join(["DUNGEON MAP", "═" * 54, *iter_map_lines(dungeon, commit_type)])
 
-        # Up to 3 file names
-        visible   = files[:3]
-        truncated = len(files) - len(visible)
-        for fi, fname in enumerate(visible):
-            fc = "└──" if (fi == len(visible) - 1 and not truncated) else "├──"
-            lines.append(f"{child_pfx}  {fc} {fname}")
-        if truncated:
-            lines.append(f"{child_pfx}  └── … +{truncated} more")
-
-        if not is_last:
-            lines.append("│")
-
-    return "\n".join(lines)
\ No newline at end of file
+    pages = max(1, -(-len(dungeon) // page_size))
+    page  = min(max(1, page), pages)
+    lines = [f"DUNGEON MAP  (page {page}/{pages})" if pages > 1 else "DUNGEON MAP", "═" * 54]
+    lines.extend(iter_map_lines(dungeon, commit_type, (page - 1) * page_size, page_size))
+    if page < pages:
+        lines.append(f"… {len(dungeon) - page * page_size} more rooms — `map {page + 1}`")
+    return "\n".join(lines)
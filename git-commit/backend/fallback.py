@@ -0,0 +1,134 @@
+"""
+fallback.py
+
+Deterministic, rule-based commit messages built from a change summary.
+
+Used when the LLM is down or misses its deadline: no I/O, no model, just
+the file list and per-file stats from commit_core.get_changes_summary —
+dominant directory for the scope, file kinds for the noun, add/delete
+ratio and renames for the verb.
+"""
+
+from __future__ import annotations
+
+import posixpath
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+# extension -> (singular, plural) noun
+_KIND_NOUNS: Dict[str, Tuple[str, str]] = {
+    ".py":   ("Python module", "Python modules"),
+    ".js":   ("script", "scripts"),
+    ".jsx":  ("component", "components"),
+    ".ts":   ("TypeScript module", "TypeScript modules"),
+    ".tsx":  ("component", "components"),
+    ".md":   ("doc", "docs"),
+    ".rst":  ("doc", "docs"),
+    ".txt":  ("text file", "text files"),
+    ".json": ("config", "config files"),
+    ".yml":  ("config", "config files"),
+    ".yaml": ("config", "config files"),
+    ".toml": ("config", "config files"),
+    ".env":  ("config", "config files"),
+    ".css":  ("stylesheet", "stylesheets"),
+    ".tcss": ("stylesheet", "stylesheets"),
+    ".html": ("template", "templates"),
+    ".sh":   ("script", "scripts"),
+}
+
+# Directory names too generic to make a useful scope
+_GENERIC_DIRS = {"", ".", "src", "lib", "app", "pkg"}
+
+_MAX_LEN = 72
+
+
+def _kind(path: str) -> str:
+    base = posixpath.basename(path).lower()
+    if base.startswith("test_") or base.endswith(("_test.py", ".test.ts", ".test.js", ".spec.ts", ".spec.js")):
+        return "test"
+    return posixpath.splitext(base)[1]
+
+
+def _noun(kinds: Iterable[str], count: int) -> str:
+    top = Counter(kinds).most_common()
+    if not top:
+        return "files"
+    if len(top) > 1:
+        return "file" if count == 1 else "files"  # mixed kinds
+    kind = top[0][0]
+    if kind == "test":
+        return "test" if count == 1 else "tests"
+    single, plural = _KIND_NOUNS.get(kind, ("file", "files"))
+    return single if count == 1 else plural
+
+
+def _dominant_dir(per_file: Sequence[Tuple[str, int, int]]) -> str:
+    """Directory carrying the most changed lines (deepest common one wins)."""
+    paths = [p for p, _, _ in per_file]
+    common = posixpath.commonpath(paths) if paths else ""
+    if common in paths:  # a single file
+        common = posixpath.dirname(common)
+    if posixpath.basename(common) not in _GENERIC_DIRS:
+        return common
+
+    weight: Counter[str] = Counter()
+    for path, ins, dels in per_file:
+        parts = path.split("/")
+        top = parts[0] if len(parts) > 1 else ""
+        if top in _GENERIC_DIRS and len(parts) > 2:
+            top = parts[1]
+        weight[top] += ins + dels + 1
+    return weight.most_common(1)[0][0] if weight else ""
+
+
+def _clip(text: str) -> str:
+    return text[:_MAX_LEN].rstrip()
+
+
+def local_commit_message(commit_type: str, summary: Dict[str, Any]) -> str:
+    """Build a Conventional Commit line from a change summary.
+
+    Example::
+
+        local_commit_message("feat", {"per_file": [("backend/app.py", 40, 2)], ...})
+          ->  "feat(backend): extend app.py"
+    """
+    files: List[str] = list(summary.get("files") or [])
+    per_file: List[Tuple[str, int, int]] = [tuple(x) for x in summary.get("per_file") or []]  # type: ignore[misc]
+    if not per_file:
+        per_file = [(f, 0, 0) for f in files]
+    renames: List[Tuple[str, str]] = [tuple(x) for x in summary.get("renames") or []]  # type: ignore[misc]
+
+    if not per_file:
+        return f"{commit_type}: update project"
+
+    ins = int(summary.get("insertions", sum(i for _, i, _ in per_file)))
+    dels = int(summary.get("deletions", sum(d for _, _, d in per_file)))
+    count = len(per_file)
+
+    scope_dir = _dominant_dir(per_file)
+    scope = posixpath.basename(scope_dir)
+    head = f"{commit_type}({scope})" if scope and scope not in _GENERIC_DIRS else commit_type
+
+    if renames and len(renames) * 2 >= count:
+        if len(renames) == 1:
+            old, new = renames[0]
+            subject = f"rename {posixpath.basename(old)} to {posixpath.basename(new)}"
+        else:
+            subject = f"rename {len(renames)} {_noun((_kind(n) for _, n in renames), len(renames))}"
+        return _clip(f"{head}: {subject}")
+
+    # add/delete ratio picks the verb
+    if dels >= 3 * max(1, ins):
+        verb = "trim"
+    elif ins >= 3 * max(1, dels):
+        verb = "extend"
+    else:
+        verb = "update"
+
+    if count == 1:
+        target = posixpath.basename(per_file[0][0])
+    else:
+        target = f"{count} {_noun((_kind(p) for p, _, _ in per_file), count)}"
+
+    return _clip(f"{head}: {verb} {target}")
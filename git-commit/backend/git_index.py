@@ -0,0 +1,271 @@
+"""
+git_index.py
+
+Pure-Python reader for the binary `.git/index` (dircache) format.
+
+The file is memory-mapped and entries are decoded lazily while iterating,
+so answering "which tracked files look modified?" costs one mmap plus one
+lstat per tracked file — no git subprocess.  Supports index versions 2, 3
+and 4 (path-prefix compression).  Split indexes are not supported; callers
+should fall back to git when IndexFormatError is raised.
+
+Format reference: Documentation/gitformat-index.txt in git.git.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import stat
+import struct
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional
+
+_HEADER = struct.Struct(">4sLL")
+_STAT = struct.Struct(">10L")  # ctime s/ns, mtime s/ns, dev, ino, mode, uid, gid, size
+_U16 = struct.Struct(">H")
+
+_FLAG_ASSUME_VALID = 0x8000
+_FLAG_EXTENDED = 0x4000
+_FLAG_STAGE = 0x3000
+_XFLAG_SKIP_WORKTREE = 0x4000
+_XFLAG_INTENT_TO_ADD = 0x2000
+
+_GITLINK = 0o160000
+_U32 = 0xFFFFFFFF
+
+
+class IndexFormatError(ValueError):
+    """The index file is missing, corrupt or uses an unsupported feature."""
+
+
+class IndexEntry(NamedTuple):
+    path: str
+    ctime_s: int
+    ctime_ns: int
+    mtime_s: int
+    mtime_ns: int
+    dev: int
+    ino: int
+    mode: int
+    uid: int
+    gid: int
+    size: int
+    sha: bytes
+    stage: int
+    assume_valid: bool
+    skip_worktree: bool
+    intent_to_add: bool
+
+
+class GitIndex:
+    """Lazily-parsed, memory-mapped view of a `.git/index` file."""
+
+    def __init__(self, path: str, hash_size: int = 20) -> None:
+        self.path = path
+        self.hash_size = hash_size
+        try:
+            with open(path, "rb") as fh:
+                st = os.fstat(fh.fileno())
+                if st.st_size < _HEADER.size:
+                    raise IndexFormatError(f"index too small: {path}")
+                self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except OSError as e:
+            raise IndexFormatError(str(e)) from e
+
+        # The index's own mtime is the reference point for racy-clean checks
+        self.mtime_ns = st.st_mtime_ns
+
+        sig, self.version, self.count = _HEADER.unpack_from(self._mm, 0)
+        if sig != b"DIRC":
+            self.close()
+            raise IndexFormatError(f"bad index signature in {path}")
+        if self.version not in (2, 3, 4):
+            self.close()
+            raise IndexFormatError(f"unsupported index version {self.version}")
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __enter__(self) -> "GitIndex":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[IndexEntry]:
+        mm = self._mm
+        pos = _HEADER.size
+        prev = b""
+        fixed = _STAT.size + self.hash_size + _U16.size
+
+        for _ in range(self.count):
+            start = pos
+            ctime_s, ctime_ns, mtime_s, mtime_ns, dev, ino, mode, uid, gid, size = _STAT.unpack_from(mm, pos)
+            sha = mm[pos + _STAT.size:pos + _STAT.size + self.hash_size]
+            (flags,) = _U16.unpack_from(mm, pos + fixed - _U16.size)
+            pos += fixed
+
+            xflags = 0
+            if flags & _FLAG_EXTENDED:
+                (xflags,) = _U16.unpack_from(mm, pos)
+                pos += _U16.size
+
+            if self.version == 4:
+                strip, pos = _read_offset(mm, pos)
+                end = mm.find(b"\0", pos)
+                name = prev[:len(prev) - strip] + mm[pos:end]
+                pos = end + 1
+            else:
+                end = mm.find(b"\0", pos)
+                name = mm[pos:end]
+                # entries are NUL-padded to a multiple of 8 bytes
+                pos = start + ((pos - start + len(name) + 8) & ~7)
+            if end < 0:
+                raise IndexFormatError("truncated index entry")
+            prev = name
+
+            yield IndexEntry(
+                name.decode("utf-8", "surrogateescape"),
+                ctime_s=ctime_s,
+                ctime_ns=ctime_ns,
+                mtime_s=mtime_s,
+                mtime_ns=mtime_ns,
+                dev=dev,
+                ino=ino,
+                mode=mode,
+                uid=uid,
+                gid=gid,
+                size=size,
+                sha=sha,
+                stage=(flags & _FLAG_STAGE) >> 12,
+                assume_valid=bool(flags & _FLAG_ASSUME_VALID),
+                skip_worktree=bool(xflags & _XFLAG_SKIP_WORKTREE),
+                intent_to_add=bool(xflags & _XFLAG_INTENT_TO_ADD),
+            )
+
+        self._check_extensions(pos)
+
+    def _check_extensions(self, pos: int) -> None:
+        end = len(self._mm) - self.hash_size
+        while pos + 8 <= end:
+            sig = self._mm[pos:pos + 4]
+            (size,) = struct.unpack_from(">L", self._mm, pos + 4)
+            if sig == b"link":
+                raise IndexFormatError("split index is not supported")
+            pos += 8 + size
+
+    def paths(self) -> List[str]:
+        """Tracked paths in index order (conflicted paths listed once)."""
+        out: List[str] = []
+        for e in self:
+            if not out or out[-1] != e.path:
+                out.append(e.path)
+        return out
+
+    def changed_paths(self, worktree: str) -> List[str]:
+        """Paths whose worktree stat data no longer matches the index.
+
+        Mirrors git's `ie_match_stat`: a mismatch means "maybe modified",
+        and racily-clean entries (mtime not older than the index) are
+        reported too, so the result is a superset of `git diff --name-only`.
+        A checked-out submodule (gitlink) is reported when its HEAD is not
+        the recorded commit or its own index shows changes; untracked files
+        inside it don't count, as in `git diff`.
+        """
+        out: List[str] = []
+        index_s, index_ns = divmod(self.mtime_ns, 1_000_000_000)
+
+        for e in self:
+            if e.stage or e.intent_to_add:
+                if not out or out[-1] != e.path:
+                    out.append(e.path)
+                continue
+            if e.assume_valid or e.skip_worktree:
+                continue
+            if e.mode == _GITLINK and os.path.isdir(os.path.join(worktree, e.path)):
+                if _submodule_changed(os.path.join(worktree, e.path), e.sha):
+                    out.append(e.path)
+                continue
+
+            try:
+                st = os.lstat(os.path.join(worktree, e.path))
+            except OSError:
+                out.append(e.path)  # deleted
+                continue
+
+            if _stat_differs(e, st) or (e.mtime_s, e.mtime_ns) >= (index_s & _U32, index_ns):
+                out.append(e.path)
+
+        return out
+
+
+def _submodule_changed(path: str, sha: bytes) -> bool:
+    # repo_state imports this module, so import it lazily
+    from repo_state import find_git_dir, read_head
+
+    if not os.path.exists(os.path.join(path, ".git")):
+        return False  # not initialized: git diff doesn't report it either
+    git_dir = find_git_dir(path)
+    if git_dir is None or read_head(git_dir) != sha.hex():
+        return True
+    try:
+        with open_index(git_dir) as idx:
+            return bool(idx.changed_paths(path))
+    except IndexFormatError:
+        return True
+
+
+def _read_offset(mm: mmap.mmap, pos: int) -> tuple[int, int]:
+    # git's varint from varint.c (offset encoding used by index v4)
+    c = mm[pos]
+    pos += 1
+    val = c & 0x7F
+    while c & 0x80:
+        val += 1
+        c = mm[pos]
+        pos += 1
+        val = (val << 7) + (c & 0x7F)
+    return val, pos
+
+
+def _stat_differs(e: IndexEntry, st: os.stat_result) -> bool:
+    if stat.S_ISLNK(st.st_mode) != stat.S_ISLNK(e.mode):
+        return True
+    if stat.S_ISREG(st.st_mode) and (st.st_mode & 0o100) != (e.mode & 0o100):
+        return True
+
+    m_s, m_ns = divmod(st.st_mtime_ns, 1_000_000_000)
+    c_s, c_ns = divmod(st.st_ctime_ns, 1_000_000_000)
+    return (
+        (m_s & _U32, m_ns) != (e.mtime_s, e.mtime_ns)
+        or (c_s & _U32, c_ns) != (e.ctime_s, e.ctime_ns)
+        or (st.st_size & _U32) != e.size
+        or (st.st_ino & _U32) != e.ino
+        or (st.st_uid & _U32) != e.uid
+        or (st.st_gid & _U32) != e.gid
+    )
+
+
+def _hash_size(git_dir: str) -> int:
+    try:
+        cfg = (Path(git_dir) / "config").read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return 20
+    return 32 if "objectformat = sha256" in cfg.lower() else 20
+
+
+def open_index(git_dir: str) -> GitIndex:
+    return GitIndex(str(Path(git_dir) / "index"), hash_size=_hash_size(git_dir))
+
+
+def changed_paths(worktree: str, git_dir: str) -> Optional[List[str]]:
+    """Candidate paths for `git diff` (unstaged), or None if unreadable."""
+    try:
+        with open_index(git_dir) as idx:
+            return idx.changed_paths(worktree)
+    except IndexFormatError:
+        return None
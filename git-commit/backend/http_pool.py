@@ -0,0 +1,213 @@
+"""
+http_pool.py
+
+Small keep-alive HTTP client used by llm_provider.
+
+Connections are pooled per (scheme, host, port) and reused across calls,
+so the Flask app and the TUI pay the TCP (and TLS) handshake once instead
+of once per message.  Each request takes separate connect and read
+timeouts.  Stdlib only (http.client).
+"""
+
+from __future__ import annotations
+
+import http.client
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterator, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "4"))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+DEFAULT_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+
+# Errors that mean a reused keep-alive socket was closed by the server
+_STALE_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+PoolKey = Tuple[str, str, int]
+
+
+class HTTPStatusError(OSError):
+    """Non-2xx response from an LLM endpoint."""
+
+    def __init__(self, status: int, reason: str, body: str) -> None:
+        super().__init__(f"HTTP {status} {reason}: {body[:200]}")
+        self.status = status
+        self.reason = reason
+        self.body = body
+
+
+class ConnectionPool:
+    """Idle keep-alive connections for one host.
+
+    At most `maxsize` idle connections are kept; extra connections opened
+    under load are closed when released instead of being pooled.
+    """
+
+    def __init__(self, scheme: str, host: str, port: int, maxsize: int = DEFAULT_POOL_SIZE) -> None:
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.maxsize = maxsize
+        self._idle: Deque[http.client.HTTPConnection] = deque()
+        self._lock = threading.Lock()
+
+    def _new_conn(self, connect_timeout: float) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=connect_timeout)
+
+    def get(self, connect_timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return (connection, reused)."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._new_conn(connect_timeout), False
+
+    def put(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return len(self._idle)
+
+
+class PooledResponse:
+    """HTTP response that returns its connection to the pool once drained.
+
+    Closing a response early (e.g. after the first streamed line) closes
+    the socket instead, which also tells the server to stop generating.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        conn: http.client.HTTPConnection,
+        resp: http.client.HTTPResponse,
+    ) -> None:
+        self._pool = pool
+        self._conn = conn
+        self._resp = resp
+        self.status = resp.status
+        self._released = False
+
+    def read(self) -> bytes:
+        data = self._resp.read()
+        self.close()
+        return data
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            line = self._resp.readline()
+            if not line:
+                break
+            yield line
+
+    def close(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        if self._resp.isclosed() and not self._resp.will_close:
+            self._pool.put(self._conn)
+        else:
+            self._resp.close()
+            self._conn.close()
+
+    def __enter__(self) -> "PooledResponse":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class PoolManager:
+    """Registry of per-host connection pools."""
+
+    def __init__(self, maxsize: int = DEFAULT_POOL_SIZE) -> None:
+        self.maxsize = maxsize
+        self._pools: Dict[PoolKey, ConnectionPool] = {}
+        self._lock = threading.Lock()
+
+    def pool_for(self, url: str) -> Tuple[ConnectionPool, str]:
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key: PoolKey = (scheme, parts.hostname or "localhost", port)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = ConnectionPool(*key, maxsize=self.maxsize)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        return pool, path
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+    ) -> PooledResponse:
+        """Send a request over a pooled connection.
+
+        Raises HTTPStatusError for non-2xx responses.  A request that fails
+        on a reused connection the server already closed is retried once on
+        a fresh one.
+        """
+        pool, path = self.pool_for(url)
+        connect_timeout = DEFAULT_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout
+        read_timeout = DEFAULT_READ_TIMEOUT if read_timeout is None else read_timeout
+        hdrs = {"Connection": "keep-alive", **(headers or {})}
+
+        while True:
+            conn, reused = pool.get(connect_timeout)
+            try:
+                if conn.sock is None:
+                    conn.timeout = connect_timeout
+                    conn.connect()
+                conn.sock.settimeout(read_timeout)
+                conn.request(method, path, body=body, headers=hdrs)
+                resp = conn.getresponse()
+            except _STALE_ERRORS:
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            break
+
+        pooled = PooledResponse(pool, conn, resp)
+        if not 200 <= resp.status < 300:
+            text = pooled.read().decode("utf-8", "replace")
+            raise HTTPStatusError(resp.status, resp.reason, text)
+        return pooled
+
+    def configure(self, maxsize: int) -> None:
+        """Change the idle-connection cap for existing and future pools."""
+        with self._lock:
+            self.maxsize = maxsize
+            for pool in self._pools.values():
+                pool.maxsize = maxsize
+
+    def close(self) -> None:
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close()
+
+
+# Shared by every caller in the process (Flask app, TUI, CLI)
+POOL = PoolManager()
@@ -0,0 +1,111 @@
+"""
+jobs.py
+
+Background jobs with an append-only event log.
+
+A JobManager runs submitted work on a bounded thread pool and keeps each
+job's stage events (queued, scanning, generating, token, done/error) so HTTP
+clients can follow them over Server-Sent Events — including clients that
+connect late or reconnect with Last-Event-ID.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Events that end a job's stream
+TERMINAL_EVENTS = ("done", "error")
+
+
+class QueueFullError(RuntimeError):
+    """Too many jobs are queued or running."""
+
+
+class Job:
+    def __init__(self) -> None:
+        self.id = uuid.uuid4().hex
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.status = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.events: List[Tuple[str, Dict[str, Any]]] = []
+        self._cond = threading.Condition()
+
+    def emit(self, event: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """Append an event; `done`/`error` also finish the job."""
+        with self._cond:
+            if self.finished is not None:
+                return
+            self.events.append((event, data or {}))
+            if event != "token":
+                self.status = event
+            if event in TERMINAL_EVENTS:
+                self.finished = time.time()
+                self.result = data
+            self._cond.notify_all()
+
+    def wait_events(self, start: int, timeout: float) -> Tuple[List[Tuple[str, Dict[str, Any]]], bool]:
+        """Events from index `start` on (blocking up to `timeout` for new
+        ones) and whether the job has finished."""
+        with self._cond:
+            if len(self.events) <= start and self.finished is None:
+                self._cond.wait(timeout)
+            return self.events[start:], self.finished is not None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "jobId": self.id,
+                "status": self.status,
+                "events": len(self.events),
+                "result": self.result,
+            }
+
+
+class JobManager:
+    """Run jobs on at most `max_workers` threads with `max_pending` queued."""
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64, ttl: float = 600.0) -> None:
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[[Job], Dict[str, Any]]) -> Job:
+        """Queue `fn(job)`; its return value becomes the `done` event."""
+        with self._lock:
+            self._prune()
+            active = sum(1 for j in self._jobs.values() if j.finished is None)
+            if active >= self.max_pending:
+                raise QueueFullError(f"{active} jobs pending")
+            job = Job()
+            job.emit("queued")
+            self._jobs[job.id] = job
+
+        def run() -> None:
+            try:
+                job.emit("done", fn(job))
+            except Exception as e:
+                job.emit("error", {"error": str(e)})
+
+        self._pool.submit(run)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl
+        for jid in [j.id for j in self._jobs.values() if j.finished and j.finished < cutoff]:
+            del self._jobs[jid]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            active = sum(1 for j in self._jobs.values() if j.finished is None)
+            return {"active": active, "retained": len(self._jobs)}
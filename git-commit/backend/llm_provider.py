@@ -1,72 +1,433 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import functools
+import itertools
 import json
 import os
-import urllib.request
-from typing import Any, Dict
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
 
+from http_pool import POOL, PooledResponse
+from metrics import observe_llm, span
+from response_cache import ResponseCache, cache_key
 
-def generate_with_provider(prompt: str, provider: str = "ollama", model: str = "qwen3:1.7b") -> str:
+# (connect_timeout, read_timeout); None falls back to the pool defaults
+Timeouts = Tuple[Optional[float], Optional[float]]
+
+# LLM calls this process may have in flight at once
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+T = TypeVar("T")
+
+
+class DaemonExecutor(Executor):
+    """Run calls on daemon threads, at most `max_workers` at a time.
+
+    ThreadPoolExecutor workers are joined at interpreter exit, so a call
+    abandoned at its deadline would keep the process alive until the read
+    timeout. Here each call gets its own daemon thread that waits for a
+    slot; a call cancelled while waiting never runs.
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = "daemon") -> None:
+        self._slots = threading.BoundedSemaphore(max(1, max_workers))
+        self._prefix = thread_name_prefix
+        self._ids = itertools.count()
+
+    def submit(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> "Future[T]":
+        future: "Future[T]" = Future()
+
+        def run() -> None:
+            with self._slots:
+                if not future.set_running_or_notify_cancel():
+                    return
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+
+        threading.Thread(target=run, name=f"{self._prefix}_{next(self._ids)}", daemon=True).start()
+        return future
+
+
+# Worker threads for agenerate. Kept separate from asyncio's default
+# executor so asyncio.run() does not wait on abandoned candidates.
+_EXECUTOR = DaemonExecutor(LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+
+# How long Ollama keeps a model loaded after a request (e.g. "30m", "-1")
+DEFAULT_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE") or None
+
+# Ollama model residency as observed by this process: cold/warming/warm/failed
+_MODEL_STATUS: Dict[str, str] = {}
+_STATUS_LOCK = threading.Lock()
+
+
+def generate_with_provider(
+    prompt: str,
+    provider: str = "ollama",
+    model: str = "qwen3:1.7b",
+    options: Optional[Dict[str, Any]] = None,
+    stream: bool = True,
+    first_line: bool = False,
+    connect_timeout: Optional[float] = None,
+    read_timeout: Optional[float] = None,
+    cache: Optional[ResponseCache] = None,
+    keep_alive: Optional[str] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+) -> str:
     """
     Currently supports:
     - ollama (default)
     - openai (optional)
 
     If provider is unknown, fallback to ollama.
+
+    `options` are passed through to the provider (Ollama names, e.g.
+    `num_predict`, `stop`, `temperature`). With `first_line=True` a
+    streaming request is cut off as soon as one complete line arrives.
+
+    Requests go over pooled keep-alive connections (see http_pool.py).
+    When `cache` is given, identical requests are answered from it.
+    `keep_alive` (default OLLAMA_KEEP_ALIVE) tells Ollama how long to keep
+    the model loaded afterwards. `on_token` receives each streamed chunk.
     """
 
+    def call() -> str:
+        return _generate(
+            prompt,
+            provider,
+            model,
+            options,
+            stream=stream,
+            first_line=first_line,
+            timeouts=(connect_timeout, read_timeout),
+            keep_alive=keep_alive,
+            on_token=on_token,
+        )
+
+    if cache is None:
+        return call()
+
+    # Key on what is actually called: env settings override the config
+    key = cache_key(prompt, *effective_target(provider, model), {**(options or {}), "first_line": first_line})
+    with span("llm.cache") as attrs:
+        hit = cache.get(key)
+        attrs["hit"] = hit is not None
+    if hit is not None:
+        return hit
+
+    out = call()
+    if out:
+        cache.put(key, out)
+    return out
+
+
+async def agenerate(
+    prompt: str,
+    n: int = 1,
+    deadline: Optional[float] = None,
+    validate: Optional[Callable[[str], bool]] = None,
+    **kwargs: Any,
+) -> List[str]:
+    """
+    Run `n` generations of `prompt` concurrently and collect the results.
+
+    Candidates beyond the first get a distinct `seed` (and a default
+    temperature of 0.7) so they differ. If `validate` is given, the first
+    result it accepts is returned alone and the rest are abandoned.
+    Results still pending after `deadline` seconds are dropped; failed
+    candidates are skipped. Remaining keyword arguments are passed to
+    generate_with_provider.
+
+    Each call runs on a worker thread (LLM_MAX_CONCURRENCY) over the shared
+    connection pool, so abandoned candidates finish or time out in the
+    background.
+    """
+    base = dict(kwargs.pop("options", None) or {})
+    loop = asyncio.get_running_loop()
+    tasks: List["asyncio.Future[str]"] = []
+    for i in range(max(1, n)):
+        options = dict(base)
+        if i > 0:
+            options.setdefault("temperature", 0.7)
+            options["seed"] = int(base.get("seed", 0)) + i
+        call = functools.partial(generate_with_provider, prompt, options=options, **kwargs)
+        tasks.append(loop.run_in_executor(_EXECUTOR, contextvars.copy_context().run, call))
+
+    results: List[str] = []
+    stop_at = None if deadline is None else loop.time() + deadline
+    pending = set(tasks)
+    try:
+        while pending:
+            timeout = None if stop_at is None else max(0.0, stop_at - loop.time())
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break  # deadline passed
+            for task in done:
+                if task.exception() is not None:
+                    continue
+                text = task.result()
+                if validate is not None and validate(text):
+                    return [text]
+                results.append(text)
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if not results:
+        # Surface the failure when every candidate errored (not merely timed out)
+        errors = [t.exception() for t in tasks if t.done() and not t.cancelled() and t.exception()]
+        if errors and len(errors) == len(tasks):
+            raise errors[0]  # type: ignore[misc]
+    return results
+
+
+def effective_target(provider: str, model: str) -> Tuple[str, str]:
+    """(provider, model) a request really goes to after env overrides:
+    OpenAI only with OPENAI_API_KEY set (model OPENAI_MODEL), otherwise
+    Ollama with OLLAMA_MODEL taking precedence over `model`."""
     provider = (provider or "ollama").lower().strip()
+    if provider == "openai" and os.getenv("OPENAI_API_KEY"):
+        return "openai", os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    return "ollama", os.getenv("OLLAMA_MODEL", model)
+
+
+def _generate(
+    prompt: str,
+    provider: str,
+    model: str,
+    options: Optional[Dict[str, Any]],
+    stream: bool,
+    first_line: bool,
+    timeouts: Timeouts,
+    keep_alive: Optional[str],
+    on_token: Optional[Callable[[str], None]] = None,
+) -> str:
+    provider, model = effective_target(provider, model)
 
     if provider == "openai":
-        key = os.getenv("OPENAI_API_KEY", "")
-        if key:
-            return _openai_generate(prompt, model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"), api_key=key)
+        with span("llm.request") as attrs:
+            attrs["provider"] = "openai"
+            return _openai_generate(
+                prompt,
+                model=model,
+                api_key=os.getenv("OPENAI_API_KEY", ""),
+                options=options,
+                timeouts=timeouts,
+            )
 
     # default
-    return _ollama_generate(prompt, model=os.getenv("OLLAMA_MODEL", model))
+    payload = _ollama_payload(model, prompt, stream, options, keep_alive)
+    with span("llm.request") as attrs:
+        attrs["provider"] = "ollama"
+        if stream:
+            out = _ollama_stream(payload, first_line=first_line, timeouts=timeouts, on_token=on_token)
+        else:
+            out = _ollama_generate(payload, timeouts=timeouts)
+    _set_status(model, "warm")
+    return out
 
 
-def _ollama_generate(prompt: str, model: str) -> str:
-    host = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
-    url = f"{host}/api/generate"
+def _set_status(model: str, status: str) -> None:
+    with _STATUS_LOCK:
+        _MODEL_STATUS[model] = status
+
+
+def model_status(model: str) -> str:
+    """Residency of an Ollama model as seen by this process."""
+    with _STATUS_LOCK:
+        return _MODEL_STATUS.get(os.getenv("OLLAMA_MODEL", model), "cold")
+
+
+def warm_up(
+    model: str,
+    provider: str = "ollama",
+    keep_alive: Optional[str] = None,
+    background: bool = True,
+) -> Optional[threading.Thread]:
+    """
+    Preload an Ollama model so the first real request skips the load time.
+
+    An Ollama generate request without a prompt just loads the model and
+    applies `keep_alive`. With `background=True` this runs on a daemon
+    thread (returned); errors only mark the model as "failed". Other
+    providers have nothing to preload.
+    """
+    if (provider or "ollama").lower().strip() == "openai" and os.getenv("OPENAI_API_KEY"):
+        return None
+
+    model = os.getenv("OLLAMA_MODEL", model)
+
+    def run() -> None:
+        _set_status(model, "warming")
+        payload: Dict[str, Any] = {"model": model, "stream": False}
+        if keep_alive or DEFAULT_KEEP_ALIVE:
+            payload["keep_alive"] = keep_alive or DEFAULT_KEEP_ALIVE
+        try:
+            with _ollama_post(payload) as resp:
+                resp.read()
+        except Exception as e:
+            _set_status(model, f"failed ({e.__class__.__name__})")
+            return
+        _set_status(model, "warm")
+
+    if not background:
+        run()
+        return None
+    t = threading.Thread(target=run, name=f"warm-up {model}", daemon=True)
+    t.start()
+    return t
+
+
+def _first_line(text: str) -> Optional[str]:
+    """
+    Return the first non-empty line once it is complete, else None.
+    A leading <think>...</think> block (reasoning models) is skipped.
+    """
+    body = text.lstrip()
+    if body.startswith("<think>"):
+        end = body.find("</think>")
+        if end < 0:
+            return None
+        body = body[end + len("</think>"):].lstrip()
+
+    nl = body.find("\n")
+    if nl < 0:
+        return None
+    return body[:nl].strip()
 
-    payload: Dict[str, Any] = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False,
-    }
 
-    req = urllib.request.Request(
+def _post_json(
+    url: str,
+    payload: Dict[str, Any],
+    timeouts: Timeouts = (None, None),
+    headers: Optional[Dict[str, str]] = None,
+) -> PooledResponse:
+    return POOL.request(
+        "POST",
         url,
-        data=json.dumps(payload).encode("utf-8"),
-        headers={"Content-Type": "application/json"},
-        method="POST",
+        body=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json", **(headers or {})},
+        connect_timeout=timeouts[0],
+        read_timeout=timeouts[1],
     )
 
-    with urllib.request.urlopen(req, timeout=60) as resp:
+
+def _ollama_payload(
+    model: str,
+    prompt: str,
+    stream: bool,
+    options: Optional[Dict[str, Any]],
+    keep_alive: Optional[str],
+) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {"model": model, "prompt": prompt, "stream": stream}
+    if options:
+        payload["options"] = options
+    keep_alive = keep_alive or DEFAULT_KEEP_ALIVE
+    if keep_alive:
+        payload["keep_alive"] = keep_alive
+    return payload
+
+
+def _ollama_post(payload: Dict[str, Any], timeouts: Timeouts = (None, None)) -> PooledResponse:
+    host = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+    return _post_json(f"{host}/api/generate", payload, timeouts)
+
+
+def _ollama_stream(
+    payload: Dict[str, Any],
+    first_line: bool = False,
+    timeouts: Timeouts = (None, None),
+    on_token: Optional[Callable[[str], None]] = None,
+) -> str:
+    """
+    Read Ollama's NDJSON stream chunk by chunk. With `first_line`, the
+    connection is closed as soon as a complete line arrives, which makes
+    Ollama abort the rest of the generation.
+    """
+    parts: List[str] = []
+    start = time.perf_counter()
+    first: Optional[float] = None
+    with _ollama_post(payload, timeouts) as resp:
+        for raw in resp:
+            if not raw.strip():
+                continue
+            chunk = json.loads(raw.decode("utf-8"))
+            if chunk.get("error"):
+                raise RuntimeError(f"Ollama error: {chunk['error']}")
+            if first is None:
+                first = time.perf_counter()
+            parts.append(str(chunk.get("response", "")))
+            if on_token is not None and parts[-1]:
+                on_token(parts[-1])
+            if chunk.get("done"):
+                resp.read()  # drain the chunked trailer so the socket is reusable
+                _observe_ollama(payload["model"], chunk, first - start)
+                break
+            if first_line and "\n" in parts[-1]:
+                line = _first_line("".join(parts))
+                if line:
+                    # Cut off before Ollama's totals: one chunk is one token
+                    observe_llm(
+                        payload["model"],
+                        tokens=len(parts),
+                        seconds=time.perf_counter() - first,
+                        first_token=first - start,
+                        measured="client",
+                    )
+                    return line
+
+    text = "".join(parts).strip()
+    return (_first_line(text + "\n") or "") if first_line else text
+
+
+def _ollama_generate(payload: Dict[str, Any], timeouts: Timeouts = (None, None)) -> str:
+    with _ollama_post(payload, timeouts) as resp:
         data = json.loads(resp.read().decode("utf-8"))
+        _observe_ollama(payload["model"], data)
         return str(data.get("response", "")).strip()
 
 
-def _openai_generate(prompt: str, model: str, api_key: str) -> str:
+def _observe_ollama(model: str, stats: Dict[str, Any], first_token: Optional[float] = None) -> None:
+    """Record Ollama's own eval_count / eval_duration (nanoseconds)."""
+    if "eval_count" not in stats:
+        return
+    observe_llm(
+        model,
+        tokens=int(stats.get("eval_count") or 0),
+        seconds=int(stats.get("eval_duration") or 0) / 1e9,
+        prompt_tokens=int(stats.get("prompt_eval_count") or 0),
+        first_token=first_token,
+    )
+
+
+def _openai_generate(
+    prompt: str,
+    model: str,
+    api_key: str,
+    options: Optional[Dict[str, Any]] = None,
+    timeouts: Timeouts = (None, None),
+) -> str:
     url = "https://api.openai.com/v1/chat/completions"
+    options = options or {}
 
     payload: Dict[str, Any] = {
         "model": model,
         "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.2,
+        "temperature": options.get("temperature", 0.2),
     }
+    if "num_predict" in options:
+        payload["max_tokens"] = options["num_predict"]
+    if "stop" in options:
+        payload["stop"] = options["stop"]
 
-    req = urllib.request.Request(
-        url,
-        data=json.dumps(payload).encode("utf-8"),
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-        },
-        method="POST",
-    )
-
-    with urllib.request.urlopen(req, timeout=60) as resp:
+    auth = {"Authorization": f"Bearer {api_key}"}
+    with _post_json(url, payload, timeouts, headers=auth) as resp:
         data = json.loads(resp.read().decode("utf-8"))
         return str(data["choices"][0]["message"]["content"]).strip()
\ No newline at end of file
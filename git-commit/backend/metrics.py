@@ -0,0 +1,230 @@
+"""
+metrics.py
+
+Stage timers and Prometheus-format metrics.
+
+`with span("diff"):` times a block. Every span is observed into the
+`commit_stage_seconds{stage=...}` histogram; inside a `collect()` block
+the span is also appended to that block's breakdown list, which is how
+`commit-cli generate --timings` prints where the time went, and while
+tracing is on it is a slice in the trace file (see tracing.py). LLM calls
+additionally report token counts and throughput via `observe_llm`.
+
+`render()` returns the registry in the Prometheus text format for the
+Flask app's /metrics. Stdlib only.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Protocol, Sequence, Tuple
+
+from tracing import TRACER
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric(Protocol):
+    name: str
+
+    def render(self) -> List[str]: ...
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for lv, value in sorted(self._values.items()):
+                out.append(f"{self.name}{_labels(self.labels, lv)} {_num(value)}")
+        return out
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts incl. +Inf, sum, count)
+        self._series: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            counts, total, n = self._series.get(label_values) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._series[label_values] = (counts, total + value, n + 1)
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for lv, (counts, total, n) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, c in zip((*self.buckets, float("inf")), counts):
+                    cumulative += c
+                    le = "+Inf" if bound == float("inf") else _num(bound)
+                    out.append(f"{self.name}_bucket{_labels((*self.labels, 'le'), (*lv, le))} {cumulative}")
+                out.append(f"{self.name}_sum{_labels(self.labels, lv)} {_num(total)}")
+                out.append(f"{self.name}_count{_labels(self.labels, lv)} {n}")
+        return out
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in zip(names, values)) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "commit_stage_seconds", "Time spent per pipeline stage.", _LATENCY_BUCKETS, labels=("stage",)
+)
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    "llm_first_token_seconds", "Time from request to first streamed token.", _LATENCY_BUCKETS, labels=("model",)
+)
+# estimated="true": counted from streamed chunks by the client, not by the server
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_tokens_per_second", "Generation throughput per request.",
+    (1, 2, 5, 10, 20, 40, 60, 80, 100, 150, 200, 400), labels=("model", "estimated"),
+)
+LLM_TOKENS = Counter("llm_eval_tokens_total", "Tokens generated.", labels=("model", "estimated"))
+LLM_PROMPT_TOKENS = Counter("llm_prompt_tokens_total", "Prompt tokens evaluated.", labels=("model",))
+LLM_EVAL_SECONDS = Counter(
+    "llm_eval_seconds_total", "Time spent generating tokens.", labels=("model", "estimated")
+)
+SINGLEFLIGHT_REQUESTS = Counter(
+    "singleflight_requests_total",
+    "Requests that ran the work (executed) or shared an in-flight call (coalesced).",
+    labels=("outcome",),
+)
+
+REGISTRY: List[Metric] = [
+    STAGE_SECONDS,
+    LLM_FIRST_TOKEN_SECONDS,
+    LLM_TOKENS_PER_SECOND,
+    LLM_TOKENS,
+    LLM_PROMPT_TOKENS,
+    LLM_EVAL_SECONDS,
+    SINGLEFLIGHT_REQUESTS,
+]
+
+# Breakdown list of the innermost collect() block, if any. A context var so
+# it follows work handed to executors via contextvars.copy_context().
+_COLLECTOR: "contextvars.ContextVar[Optional[List[Dict[str, Any]]]]" = contextvars.ContextVar(
+    "metrics_collector", default=None
+)
+
+
+@contextmanager
+def collect() -> Iterator[List[Dict[str, Any]]]:
+    """Gather the spans run in this context into a list of
+    {"stage", "ms", ...} dicts (in completion order)."""
+    entries: List[Dict[str, Any]] = []
+    token = _COLLECTOR.set(entries)
+    try:
+        yield entries
+    finally:
+        _COLLECTOR.reset(token)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[Dict[str, Any]]:
+    """Time a block as `stage`. The yielded dict holds extra attributes
+    for the breakdown entry (e.g. file counts)."""
+    attrs: Dict[str, Any] = {}
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage)
+        entries = _COLLECTOR.get()
+        if entries is not None:
+            entries.append({"stage": stage, "ms": round(elapsed * 1000, 2), **attrs})
+        if TRACER.enabled:
+            TRACER.complete(stage, "stage", start, elapsed, attrs)
+
+
+def observe_llm(
+    model: str,
+    tokens: int,
+    seconds: float,
+    prompt_tokens: Optional[int] = None,
+    first_token: Optional[float] = None,
+    measured: str = "server",
+) -> None:
+    """Record one generation's token counts and throughput.
+
+    `measured` is "server" when the numbers come from Ollama's own
+    eval_count/eval_duration and "client" when they are counted from
+    streamed chunks (a stream cut off early never gets Ollama's totals).
+    Client counts are estimates and go to separate series, labelled
+    estimated="true", so they don't skew the server's numbers.
+    """
+    estimated = "true" if measured == "client" else "false"
+    LLM_TOKENS.inc(tokens, model, estimated)
+    LLM_EVAL_SECONDS.inc(seconds, model, estimated)
+    if prompt_tokens:
+        LLM_PROMPT_TOKENS.inc(prompt_tokens, model)
+    if first_token is not None:
+        LLM_FIRST_TOKEN_SECONDS.observe(first_token, model)
+    rate = tokens / seconds if seconds > 0 else 0.0
+    if tokens:
+        LLM_TOKENS_PER_SECOND.observe(rate, model, estimated)
+
+    entries = _COLLECTOR.get()
+    if entries is not None:
+        entry: Dict[str, Any] = {
+            "stage": "llm.eval",
+            "ms": round(seconds * 1000, 2),
+            "model": model,
+            "tokens": tokens,
+            "tokensPerSec": round(rate, 1),
+            "measured": measured,
+        }
+        if prompt_tokens:
+            entry["promptTokens"] = prompt_tokens
+        if first_token is not None:
+            entry["firstTokenMs"] = round(first_token * 1000, 2)
+        entries.append(entry)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def format_breakdown(entries: Sequence[Dict[str, Any]]) -> str:
+    """Human-readable table of collected spans for the CLI."""
+    rows = []
+    for e in entries:
+        extra = ", ".join(f"{k}={v}" for k, v in e.items() if k not in ("stage", "ms"))
+        rows.append(f"  {e['stage']:<16} {e['ms']:>10.2f} ms" + (f"  ({extra})" if extra else ""))
+    return "\n".join(rows)
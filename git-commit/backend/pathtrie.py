@@ -0,0 +1,123 @@
+"""
+pathtrie.py
+
+Path trie with per-subtree file counts and diff totals.
+
+Each node is a directory; files hang off their parent node with their own
+(insertions, deletions, old_path) stats. Adding a file updates the
+totals of every ancestor, so "how many files / lines changed under
+backend/api" is a walk down the path segments, and listing a subtree
+touches only that subtree. Used by the dungeon (nested rooms) and the TUI
+(filtering a change summary to the current room).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+
+class FileStat(NamedTuple):
+    insertions: int = 0
+    deletions: int = 0
+    old_path: Optional[str] = None  # rename source
+    order: int = 0                  # insertion order, to keep diff order
+
+
+class TrieNode:
+    __slots__ = ("path", "children", "files", "file_count", "insertions", "deletions")
+
+    def __init__(self, path: str) -> None:
+        self.path = path  # "" for the root, else "a/b"
+        self.children: Dict[str, TrieNode] = {}
+        self.files: Dict[str, FileStat] = {}  # direct files: name -> stats
+        self.file_count = 0  # whole subtree
+        self.insertions = 0
+        self.deletions = 0
+
+    def iter_files(self) -> Iterator[Tuple[str, FileStat]]:
+        """(path, stats) for every file in the subtree, unordered."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            prefix = f"{node.path}/" if node.path else ""
+            for name, stat in node.files.items():
+                yield prefix + name, stat
+            stack.extend(node.children.values())
+
+    def file_list(self) -> List[Tuple[str, FileStat]]:
+        """Subtree files in the order they were added."""
+        return sorted(self.iter_files(), key=lambda item: item[1].order)
+
+
+class PathTrie:
+    def __init__(self) -> None:
+        self.root = TrieNode("")
+        self._added = 0
+
+    def __len__(self) -> int:
+        return self.root.file_count
+
+    def add(self, path: str, insertions: int = 0, deletions: int = 0, old_path: Optional[str] = None) -> None:
+        *dirs, name = path.strip("/").split("/")
+        node = self.root
+        trail = [node]
+        for part in dirs:
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = TrieNode(f"{node.path}/{part}" if node.path else part)
+            node = child
+            trail.append(node)
+
+        previous = node.files.get(name)
+        if previous is not None:  # same path twice: replace its numbers
+            insertions_delta = insertions - previous.insertions
+            deletions_delta = deletions - previous.deletions
+            count_delta = 0
+            order = previous.order
+        else:
+            insertions_delta, deletions_delta, count_delta = insertions, deletions, 1
+            order = self._added
+            self._added += 1
+        node.files[name] = FileStat(insertions, deletions, old_path, order)
+        for n in trail:
+            n.file_count += count_delta
+            n.insertions += insertions_delta
+            n.deletions += deletions_delta
+
+    def find(self, path: str) -> Optional[TrieNode]:
+        """Directory node for `path` ("" is the root); None if absent."""
+        node = self.root
+        for part in filter(None, path.strip("/").split("/")):
+            node = node.children.get(part)  # type: ignore[assignment]
+            if node is None:
+                return None
+        return node
+
+    def closest(self, path: str) -> TrieNode:
+        """Deepest existing directory on the way to `path`."""
+        node = self.root
+        for part in filter(None, path.strip("/").split("/")):
+            child = node.children.get(part)
+            if child is None:
+                break
+            node = child
+        return node
+
+    @classmethod
+    def from_paths(cls, paths: Sequence[str]) -> "PathTrie":
+        trie = cls()
+        for p in paths:
+            trie.add(p)
+        return trie
+
+    @classmethod
+    def from_summary(cls, summary: Dict[str, Any]) -> "PathTrie":
+        """Trie of a commit_core change summary with exact per-file stats."""
+        renamed_from = {new: old for old, new in summary.get("renames") or []}
+        trie = cls()
+        per_file = summary.get("per_file")
+        if per_file is None:
+            per_file = [(f, 0, 0) for f in summary.get("files") or []]
+        for path, ins, dels in per_file:
+            trie.add(path, int(ins), int(dels), renamed_from.get(path))
+        return trie
@@ -0,0 +1,120 @@
+"""
+repo_state.py
+
+Cheap, subprocess-free fingerprints of a repository's index and worktree.
+
+A fingerprint changes whenever anything `git diff` (staged or unstaged)
+could report changes: the index file, HEAD, or the stat data of any
+tracked file.  It is used to decide whether a cached change summary is
+still valid without forking git.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from git_index import IndexFormatError, open_index
+
+# (mtime_ns, size) of the index the tracked list was read from, plus the list
+_TRACKED: Dict[str, Tuple[Tuple[int, int], List[str]]] = {}
+
+
+def _stat_key(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def find_git_dir(path: str) -> Optional[str]:
+    """Locate the git dir for `path` by looking for .git upwards (no git call)."""
+    cur = os.path.abspath(path)
+    while True:
+        dot_git = os.path.join(cur, ".git")
+        if os.path.isdir(dot_git):
+            return dot_git
+        if os.path.isfile(dot_git):  # linked worktree / submodule: "gitdir: <path>"
+            try:
+                with open(dot_git, encoding="utf-8") as fh:
+                    line = fh.readline().strip()
+            except OSError:
+                return None
+            if line.startswith("gitdir:"):
+                return os.path.join(cur, line[len("gitdir:"):].strip())
+            return None
+        parent = os.path.dirname(cur)
+        if parent == cur:
+            return None
+        cur = parent
+
+
+def read_head(git_dir: str) -> str:
+    """Resolve HEAD to a commit id (or a ref-state token) by reading files only."""
+    gd = Path(git_dir)
+    try:
+        head = (gd / "HEAD").read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+
+    if not head.startswith("ref:"):
+        return head  # detached HEAD
+
+    ref = head[4:].strip()
+    try:
+        return (gd / ref).read_text(encoding="utf-8").strip()
+    except OSError:
+        pass
+
+    # Ref lives in packed-refs (or in the common dir of a linked worktree)
+    common = gd
+    try:
+        common = gd / (gd / "commondir").read_text(encoding="utf-8").strip()
+        return (common / ref).read_text(encoding="utf-8").strip()
+    except OSError:
+        pass
+    return f"{ref}@{_stat_key(common / 'packed-refs')}"
+
+
+def tracked_files(worktree: str, git_dir: str) -> List[str]:
+    """Return tracked paths, re-reading them only when the index changes."""
+    index_key = _stat_key(Path(git_dir) / "index") or (0, 0)
+    cached = _TRACKED.get(worktree)
+    if cached and cached[0] == index_key:
+        return cached[1]
+
+    try:
+        with open_index(git_dir) as idx:
+            files = idx.paths()
+    except IndexFormatError:
+        res = subprocess.run(
+            ["git", "ls-files", "-z", "--full-name"],
+            cwd=worktree,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        files = [f for f in res.stdout.split("\0") if f]
+    _TRACKED[worktree] = (index_key, files)
+    return files
+
+
+def worktree_fingerprint(worktree: str, git_dir: str) -> str:
+    """
+    Hash of index stat, HEAD and the stat data of every tracked file.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{_stat_key(Path(git_dir) / 'index')}|{read_head(git_dir)}\n".encode())
+
+    for rel in tracked_files(worktree, git_dir):
+        try:
+            st = os.lstat(os.path.join(worktree, rel))
+            h.update(f"{rel}\0{st.st_mtime_ns}\0{st.st_size}\0{st.st_ino}\0{st.st_mode}\n".encode())
+        except OSError:
+            h.update(f"{rel}\0-\n".encode())
+
+    return h.hexdigest()
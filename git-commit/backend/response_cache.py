@@ -0,0 +1,193 @@
+"""
+response_cache.py
+
+Two-tier cache for LLM responses: an in-memory LRU in front of a SQLite
+file in the repository's git dir (never the worktree, where `git add -A`
+would commit it), or in the user cache dir outside a repo.  Entries are
+keyed on the normalized prompt, provider, model and provider options,
+expire after a TTL, and the disk tier is trimmed to a maximum number of
+rows (least recently used first).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from repo_state import find_git_dir
+
+CACHE_FILE = "commit-message-cache.sqlite3"
+
+# Where caches of projects outside a git repo live
+USER_CACHE_DIR = Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache") / "commit-cli"
+
+DEFAULT_TTL = float(os.getenv("COMMIT_CACHE_TTL", str(7 * 24 * 3600)))
+DEFAULT_MEMORY_ENTRIES = int(os.getenv("COMMIT_CACHE_MEMORY_ENTRIES", "256"))
+DEFAULT_DISK_ENTRIES = int(os.getenv("COMMIT_CACHE_DISK_ENTRIES", "5000"))
+
+
+def cache_key(prompt: str, provider: str, model: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """Stable key: whitespace-normalized prompt + provider + model + options."""
+    norm = " ".join(prompt.split())
+    blob = json.dumps(
+        [norm, (provider or "").lower().strip(), model, options or {}],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Memory LRU + SQLite response cache. Thread-safe."""
+
+    def __init__(
+        self,
+        path: Optional[str],
+        ttl: float = DEFAULT_TTL,
+        memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+        disk_entries: int = DEFAULT_DISK_ENTRIES,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._mem: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = self._open(path)
+
+    @staticmethod
+    def _open(path: str) -> Optional[sqlite3.Connection]:
+        try:
+            db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            db.commit()
+            return db
+        except sqlite3.Error:
+            # A read-only or corrupt project dir must not break generation
+            return None
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                if now - hit[0] <= self.ttl:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return hit[1]
+                del self._mem[key]
+
+            value = self._disk_get(key, now)
+            if value is None:
+                self.misses += 1
+                return None
+            self._mem_put(key, value[0], value[1])
+            self.hits += 1
+            return value[1]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._mem_put(key, now, value)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses(key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._trim(now)
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+    def _mem_put(self, key: str, created: float, value: str) -> None:
+        self._mem[key] = (created, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_entries:
+            self._mem.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT created, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[0] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return float(row[0]), str(row[1])
+        except sqlite3.Error:
+            return None
+
+    def _trim(self, now: float) -> None:
+        assert self._db is not None
+        self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.disk_entries,),
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "memoryEntries": len(self._mem)}
+
+
+_CACHES: Dict[str, ResponseCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def cache_path(project_dir: str) -> str:
+    """`<git dir>/commit-message-cache.sqlite3`, or a per-project file in
+    USER_CACHE_DIR when `project_dir` is not in a repo."""
+    git_dir = find_git_dir(project_dir)
+    if git_dir is not None:
+        return str(Path(git_dir).resolve() / CACHE_FILE)
+    digest = hashlib.sha256(str(Path(project_dir).resolve()).encode("utf-8")).hexdigest()[:16]
+    try:
+        USER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        pass  # _open() then runs without the disk tier
+    return str(USER_CACHE_DIR / f"{digest}-{CACHE_FILE}")
+
+
+def get_response_cache(project_dir: str) -> ResponseCache:
+    """Return the shared cache for `project_dir` (see cache_path)."""
+    path = cache_path(project_dir)
+    with _CACHES_LOCK:
+        cache = _CACHES.get(path)
+        if cache is None:
+            cache = _CACHES[path] = ResponseCache(path)
+        return cache
@@ -0,0 +1,105 @@
+"""
+singleflight.py
+
+Duplicate-call suppression: while a call for a key is in flight, other
+callers with the same key wait for it and share its result (or exception)
+instead of doing the work again. A running call can also notify() its
+progress, which every caller sharing it receives. Outcomes are counted
+in the metrics registry as singleflight_requests_total{outcome}.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+from metrics import SINGLEFLIGHT_REQUESTS
+
+T = TypeVar("T")
+
+# Receives the arguments of each notify() for the call it listens to
+Listener = Callable[..., None]
+
+
+class _Call(Generic[T]):
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[T] = None
+        self.error: Optional[BaseException] = None
+        # Progress so far, replayed to callers that join late
+        self.notes: List[Tuple[Any, ...]] = []
+        self.listeners: List[Listener] = []
+        self.lock = threading.Lock()
+
+    def listen(self, listener: Listener) -> None:
+        with self.lock:
+            for args in self.notes:
+                listener(*args)
+            self.listeners.append(listener)
+
+
+class Singleflight:
+    """Coalesce concurrent calls that share a key. Thread-safe."""
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _Call[Any]] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T], listener: Optional[Listener] = None) -> Tuple[T, bool]:
+        """Run `fn` once per in-flight key.
+
+        Returns (result, shared) where `shared` is True for callers that
+        waited on another caller's execution. `listener` gets every
+        notify(key, ...) of the call, including those made before this
+        caller joined it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+        SINGLEFLIGHT_REQUESTS.inc(1, "executed" if leader else "coalesced")
+        if listener is not None:
+            call.listen(listener)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True  # type: ignore[return-value]
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def notify(self, key: Hashable, *args: Any) -> None:
+        """Pass `args` to the listeners of the in-flight call for `key`."""
+        with self._lock:
+            call = self._calls.get(key)
+        if call is None:
+            return
+        with call.lock:
+            call.notes.append(args)
+            for listener in call.listeners:
+                listener(*args)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "inflight": len(self._calls),
+            }
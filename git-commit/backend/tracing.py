@@ -0,0 +1,178 @@
+"""
+tracing.py
+
+Session timelines in the Chrome trace-event format (load the file in
+Perfetto or chrome://tracing).
+
+Tracing is off unless COMMIT_TRACE=<file.json> is set or a caller runs
+`start(path)` (the CLI's and the TUI's `--trace`). While it is on, every
+metrics.span, each `@traced` function and each `trace_span` block becomes
+a complete ("X") event on its thread; coroutines are recorded as async
+slices so awaits don't break the nesting. The file is written at exit or
+on `stop()`. When off, each hook costs one attribute check.
+"""
+
+from __future__ import annotations
+
+import atexit
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Stop recording past this many events (a long TUI session at 60 fps adds up)
+MAX_EVENTS = int(os.getenv("COMMIT_TRACE_MAX_EVENTS", "500000"))
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.path: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._threads: Dict[int, str] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def _us(self, t: float) -> float:
+        return round((t - self._origin) * 1e6, 3)
+
+    def _append(self, event: Dict[str, Any]) -> None:
+        tid = threading.get_ident()
+        event.setdefault("pid", self._pid)
+        event.setdefault("tid", tid)
+        with self._lock:
+            if tid not in self._threads:
+                self._threads[tid] = threading.current_thread().name
+            if len(self.events) >= MAX_EVENTS:
+                self.dropped += 1
+                return
+            self.events.append(event)
+
+    def complete(self, name: str, cat: str, start: float, dur: float, args: Optional[Dict[str, Any]] = None) -> None:
+        """A finished slice; `start` is a time.perf_counter() value, `dur` seconds."""
+        event = {"name": name, "cat": cat, "ph": "X", "ts": self._us(start), "dur": round(dur * 1e6, 3)}
+        if args:
+            event["args"] = args
+        self._append(event)
+
+    def async_slice(self, name: str, cat: str, start: float, end: float, args: Optional[Dict[str, Any]] = None) -> None:
+        """A slice that may overlap others on its thread (a coroutine)."""
+        sid = next(self._ids)
+        begin = {"name": name, "cat": cat, "ph": "b", "id": sid, "ts": self._us(start)}
+        if args:
+            begin["args"] = args
+        self._append(begin)
+        self._append({"name": name, "cat": cat, "ph": "e", "id": sid, "ts": self._us(end)})
+
+    def instant(self, name: str, cat: str, args: Optional[Dict[str, Any]] = None) -> None:
+        event = {"name": name, "cat": cat, "ph": "i", "s": "t", "ts": self._us(time.perf_counter())}
+        if args:
+            event["args"] = args
+        self._append(event)
+
+    def counter(self, name: str, values: Dict[str, float]) -> None:
+        self._append({"name": name, "ph": "C", "ts": self._us(time.perf_counter()), "args": values})
+
+    def dump(self, path: str) -> None:
+        with self._lock:
+            meta = [
+                {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+                for tid, name in self._threads.items()
+            ]
+            doc = {
+                "traceEvents": meta + self.events,
+                "displayTimeUnit": "ms",
+                "otherData": {"droppedEvents": self.dropped},
+            }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(doc, fh, separators=(",", ":"))
+        os.replace(tmp, path)
+
+
+TRACER = Tracer()
+
+
+def start(path: str) -> None:
+    """Start recording; the trace is written to `path` at exit."""
+    first = TRACER.path is None
+    TRACER.path = path
+    if first:
+        atexit.register(stop)
+
+
+def stop() -> Optional[str]:
+    """Write the trace (if recording) and stop. Returns the file path."""
+    path = TRACER.path
+    if path is None:
+        return None
+    TRACER.path = None
+    TRACER.dump(path)
+    return path
+
+
+def enabled() -> bool:
+    return TRACER.enabled
+
+
+@contextmanager
+def trace_span(name: str, cat: str = "app", args: Optional[Dict[str, Any]] = None) -> Iterator[None]:
+    if not TRACER.enabled:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        TRACER.complete(name, cat, t0, time.perf_counter() - t0, args)
+
+
+def traced(name: Optional[str] = None, cat: str = "app") -> Callable[[F], F]:
+    """Decorator: record each call of a function or coroutine function."""
+
+    def deco(fn: F) -> F:
+        label = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args: Any, **kwargs: Any) -> Any:
+                if not TRACER.enabled:
+                    return await fn(*args, **kwargs)
+                t0 = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    TRACER.async_slice(label, cat, t0, time.perf_counter())
+
+            return awrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not TRACER.enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                TRACER.complete(label, cat, t0, time.perf_counter() - t0)
+
+        return wrapper  # type: ignore[return-value]
+
+    return deco
+
+
+if os.getenv("COMMIT_TRACE"):
+    start(os.environ["COMMIT_TRACE"])
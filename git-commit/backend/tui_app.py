@@ -8,30 +8,60 @@ enemies that you defeat by crafting and committing well-formed commit messages.
 from __future__ import annotations
 
 import os
+import sys
+import time
 import asyncio
+import argparse
+import functools
 import random
 import hashlib
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple
 
 from textual.app import App, ComposeResult
 from textual.reactive import reactive
-from textual.containers import Container, Horizontal, Vertical, VerticalScroll
-from textual.widgets import Footer, Header, Input, Markdown, Static
+from textual.containers import Container, Horizontal, Vertical
+from textual.timer import Timer
+from textual.widgets import Footer, Header, Input, Static
+from textual.worker import Worker
 
 from commit_core import (
+    agenerate_commit_messages,
+    compose_commit_message,
     ensure_git_repo,
     ensure_project_dir,
-    generate_commit_message,
     get_changes_summary,
+    llm_deadline,
     load_config,
     maybe_auto_commit,
+    model_warmth,
+    normalize_commit_type,
     save_config,
+    warm_up_model,
 )
 
+from arenaview import ArenaView
+from chargrid import CharGrid
+from combatlog import CombatLog
+from fallback import local_commit_message
+from response_cache import get_response_cache
 from enemies import enemy_kinds_for_files, get_enemy
-from dungeon import build_dungeon, lore_name, render_map, render_room
+from dungeon import (
+    DUNGEON_SOURCE,
+    build_dungeon,
+    get_dungeon_index,
+    lore_name,
+    render_cache_stats,
+    render_map,
+    render_room,
+    room_trie,
+)
+from pathtrie import PathTrie
 from player import PlayerHUD, HandFrame, HUD_ROWS
+import tracing
+from tracing import TRACER, trace_span, traced
 
 DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "qwen3:1.7b")
 
@@ -121,13 +151,151 @@ def enemy_hp(files: List[str], ins: int, dels: int, kind: str) -> int:
     return base
 
 
+# Wall bricks per diff-heat tier: quiet hall (carved stone blocks), medium
+# activity, heavily modified (solid brick)
+_BRICKS = (("[", "]"), ("H", "-"), ("8", "="))
+
+
+def _heat_tier(heat: int) -> int:
+    return 2 if heat > 180 else 1 if heat > 60 else 0
+
+
+@functools.lru_cache(maxsize=64)
+def _corridor_layer(seed: int, W: int, H: int, tier: int) -> Tuple[str, ...]:
+    """Draw a first-person dungeon corridor matching Arena's perspective.
+
+    Key visual elements from the reference:
+      - Dark open void in the CENTER — walls are on the SIDES only
+      - Stone brick walls converge from left/right toward a vanishing point
+      - Chains hanging from the ceiling near the walls
+      - Ceiling is a dark slab with slight texture
+      - Floor is dark near the horizon, gains tile texture near camera
+      - Inner wall face shows a diagonal converging line (\\ and /)
+
+    Static background layer: a pure function of its arguments, so it is
+    cached and shared by every frame and redraw of the same arena.
+    """
+    rng    = random.Random(seed)
+    lines: List[str] = []
+
+    ceil_h  = max(2, H * 22 // 100)
+    floor_h = max(2, H * 28 // 100)
+    mid_h   = H - ceil_h - floor_h
+    half    = W // 2
+
+    # ── ceiling ───────────────────────────────────────────────────────
+    lines.append("+" + "-" * (W - 2) + "+")
+    for row in range(1, ceil_h):
+        t         = row / ceil_h          # 0=top, 1=bottom of ceiling band
+        row_chars = [" "] * W
+        # converging perspective lines from top corners toward center
+        left_x  = max(0, int(half * (1.0 - t)))
+        right_x = W - 1 - left_x
+        if 0 <= left_x < W:
+            row_chars[left_x]  = "\\"
+        if 0 <= right_x < W:
+            row_chars[right_x] = "/"
+        # sparse ceiling drip/texture between the lines
+        for c in range(left_x + 1, right_x):
+            if rng.random() < 0.025:
+                row_chars[c] = rng.choice(["'", "`", ".", ","])
+        # chains at ~W/4 and 3W/4 — only in upper ceiling rows
+        for cx in [W // 4, 3 * W // 4]:
+            if 0 <= cx < W and t < 0.75:
+                row_chars[cx] = "|" if row % 2 == 0 else "+"
+        lines.append("".join(row_chars))
+
+    # ── corridor walls + dark center ──────────────────────────────────
+    # Brick chars vary by diff heat so the room feels different each time
+    b1, b2 = _BRICKS[tier]
+
+    for row in range(mid_h):
+        t      = row / max(1, mid_h - 1)
+        wall_w = max(2, int(W * (0.06 + 0.32 * t)))
+        row_chars = list(" " * W)
+
+        # Build brick columns — alternating rows offset for realism
+        brick_offset = 2 if (row // 2) % 2 == 1 else 0
+        for c in range(wall_w):
+            bpos = (c + brick_offset) % 5
+            if bpos == 0:
+                ch = "|"
+            elif bpos == 4 and row % 3 == 0:
+                ch = "+"
+            elif row % 3 == 0:
+                ch = "-"
+            else:
+                ch = b1 if (c % 2 == 0) else b2
+            row_chars[c]             = ch
+            row_chars[W - 1 - c]     = ch
+
+        # Inner wall face — perspective diagonal becomes vertical near camera
+        inner_l = "\\" if t < 0.6 else "|"
+        inner_r = "/" if t < 0.6 else "|"
+        if wall_w < W // 2:
+            row_chars[wall_w]         = inner_l
+            row_chars[W - 1 - wall_w] = inner_r
+
+        # Torch sconces at 1/3 and 2/3 depth
+        if row == mid_h // 3 and wall_w >= 3:
+            row_chars[wall_w - 2] = "}"
+            row_chars[wall_w - 1] = "*"
+            row_chars[W - wall_w]     = "*"
+            row_chars[W - wall_w + 1] = "{"
+        if row == (mid_h * 2) // 3 and wall_w >= 2:
+            row_chars[wall_w - 1] = "}"
+            row_chars[W - wall_w] = "{"
+
+        lines.append("".join(row_chars)[:W].ljust(W))
+
+    # ── floor ─────────────────────────────────────────────────────────
+    for row in range(floor_h):
+        t         = row / max(1, floor_h - 1)  # 0=horizon, 1=near camera
+        row_chars = [" "] * W
+        # perspective convergence lines
+        floor_x = max(0, int(half * (1.0 - t)))
+        if floor_x < half:
+            row_chars[floor_x]         = "/"
+            row_chars[W - 1 - floor_x] = "\\"
+        # tile texture only appears close to camera
+        if t > 0.35:
+            tile_w = max(2, int(2 + t * 7))
+            for c in range(floor_x + 1, W - floor_x - 1):
+                local = c % tile_w
+                if local == 0:
+                    row_chars[c] = "+"
+                elif t > 0.65 and rng.random() < 0.08:
+                    row_chars[c] = rng.choice([".", ",", "_"])
+                else:
+                    row_chars[c] = "-" if (c // tile_w) % 2 == 0 else "_"
+        lines.append("".join(row_chars))
+
+    # bottom edge
+    if len(lines) < H:
+        lines.append("+" + "=" * (W - 2) + "+")
+
+    return tuple(ln[:W].ljust(W) for ln in lines[:H])
+
+
+
 class CommitQuest(App[None]):
     CSS_PATH = "ascii.tcss"
     arena_status: reactive[str] = reactive("")
     BINDINGS = [
         ("ctrl+c", "quit", "Quit"),
-        ("escape", "focus_cmd", "Command"),
+        ("escape", "focus_cmd", "Command / Break off"),
     ]
+    # Tick of the event-loop lag probe that runs while tracing
+    LAG_PROBE_INTERVAL = 0.05
+    # Rooms per page of `map`
+    MAP_PAGE_SIZE = 25
+    # Pre-rendered swing / cast HUD sequences kept (per weapon and width)
+    FRAME_CACHE_SIZE = 16
+    # Resize events are coalesced into at most one arena render per interval
+    RESIZE_INTERVAL = 1 / 30
+    # Spinner shown in the prompt while a command is channeling
+    CHANNEL_FRAMES = "◐◓◑◒"
+    CHANNEL_INTERVAL = 0.12
 
     def __init__(self) -> None:
         super().__init__()
@@ -140,6 +308,7 @@ class CommitQuest(App[None]):
         self.current_room: str = "root"
 
         self.last_message: str = ""
+        self.spell_candidates: List[str] = []
         self.last_commit_type: str = "feat"
         self.last_summary: Dict[str, Any] = {
             "mode":         "unstaged",
@@ -152,7 +321,27 @@ class CommitQuest(App[None]):
         self.enemies: List[Enemy] = []
         self.enemy_index: int = 0
 
-        self._log_md: str = ""
+        # Commands doing git / LLM work run as workers in the "channel"
+        # group (see _channel); blocking calls inside them go to threads.
+        # _repo_lock keeps repo-mutating git calls one at a time.
+        self._channels: Dict[Worker[Any], Tuple[str, bool]] = {}  # worker -> (label, cancellable)
+        self._channel_timer: Optional[Timer] = None
+        self._channel_tick = 0
+        self._repo_lock = threading.Lock()
+
+        # Arena layer caches: (key, pinned object, value); see _arena_seed
+        # and _generate_arena
+        self._seed_cache: Optional[Tuple[Any, Any, int]] = None
+        self._arena_cache: Optional[Tuple[Any, Any, List[str]]] = None
+        # (animation, weapon, width) -> separator + HUD rows of each frame;
+        # composited under whatever the arena currently shows
+        self._frame_cache: "OrderedDict[Tuple[str, str, int], Tuple[str, ...]]" = OrderedDict()
+        # (width, hand and weapon lines) -> rendered HUD rows
+        self._hud_cache: Dict[Any, List[str]] = {}
+        # Viewport of the last arena render and the pending coalesced
+        # resize render (see on_resize)
+        self._viewport_size: Tuple[int, int] = (0, 0)
+        self._resize_timer: Optional[Timer] = None
 
     # ------------------------------------------------------------------
     # Layout
@@ -164,10 +353,9 @@ class CommitQuest(App[None]):
             # Banner is hidden via CSS; kept in the DOM so `display: block`
             # in the tcss can re-enable it without a code change.
             yield Static(BANNER, id="banner")
-            yield Static("", id="arena")
+            yield ArenaView(id="arena")
             with Vertical(id="console"):
-                with VerticalScroll(id="log"):
-                    yield Markdown("", id="log_md")
+                yield CombatLog(id="log")
                 with Horizontal(id="cmdrow"):
                     yield Static("> ", id="prompt")
                     yield Input(placeholder="> type a command…", id="cmd")
@@ -175,19 +363,116 @@ class CommitQuest(App[None]):
 
     def on_mount(self) -> None:
         self._write_log(self._intro_text())
+        self._warm_up()
         self._update_status()
         # Defer the first arena render until after the layout pass so
         # content_size is populated and the corridor fills the full widget.
         self.call_after_refresh(self._render_arena)
         self.query_one("#cmd", Input).focus()
+        if tracing.enabled():
+            self._lag_tick = time.perf_counter()
+            self.set_interval(self.LAG_PROBE_INTERVAL, self._probe_loop_lag)
+
+    def _probe_loop_lag(self) -> None:
+        """Trace how late each probe tick fires (event-loop stalls)."""
+        now = time.perf_counter()
+        lag = max(0.0, now - self._lag_tick - self.LAG_PROBE_INTERVAL)
+        self._lag_tick = now
+        TRACER.counter("loop_lag_ms", {"lag": round(lag * 1000, 2)})
+
+    def _warm_up(self) -> None:
+        """Load the model in the background so the first `gen` is fast."""
+        def run() -> None:
+            warm_up_model(self.cfg, background=False)
+            self.call_from_thread(self._on_warm)
+
+        self.run_worker(run, thread=True, group="warmup")
+
+    def _on_warm(self) -> None:
+        status = model_warmth(self.cfg)
+        if status == "warm":
+            self._write_log(f"### 🔥 The spellbook glows\n\n`{self.cfg.get('model', DEFAULT_MODEL)}` is warm.")
+        elif status.startswith("failed"):
+            self._write_log(
+                "### 🥶 The spellbook stays cold\n\n"
+                f"Could not preload `{self.cfg.get('model', DEFAULT_MODEL)}` — is Ollama running?"
+            )
+        self._update_status()
 
-    def on_resize(self) -> None:
-        """Redraw the arena whenever the terminal is resized."""
+    def on_arena_view_resized(self) -> None:
+        """Redraw the arena after it is resized.
+
+        Dragging a terminal edge fires a burst of resize events; they are
+        coalesced into at most one render per RESIZE_INTERVAL, and the
+        render reads the size when it runs, so the final size is always
+        the one drawn.
+        """
+        if self._resize_timer is None:
+            self._resize_timer = self.set_timer(self.RESIZE_INTERVAL, self._render_resized)
+
+    def _render_resized(self) -> None:
+        self._resize_timer = None
+        old_w, old_h = self._viewport_size
+        width, height = self._viewport()
+        if (width, height) == (old_w, old_h):
+            return
+        self._hud_cache.clear()
+        self._frame_cache.clear()
         self._render_arena()
 
     def action_focus_cmd(self) -> None:
+        """Esc: break off a channeling `scan` / `gen`, and focus the prompt."""
+        for worker, (label, cancellable) in list(self._channels.items()):
+            if cancellable and not worker.is_cancelled:
+                worker.cancel()
+                self._write_log(f"### 🛑 You break off the `{label}` channeling.")
         self.query_one("#cmd", Input).focus()
 
+    # ------------------------------------------------------------------
+    # Channeling (off-event-loop work)
+    # ------------------------------------------------------------------
+
+    def _channel(self, label: str, work: Coroutine[Any, Any, None], cancellable: bool = True) -> None:
+        """Run a git / LLM command as a worker with the channeling indicator
+        up until it ends. One command channels at a time; Esc breaks off a
+        `cancellable` one (its thread finishes in the background and its
+        result is dropped)."""
+        if self._channels:
+            work.close()
+            busy = next(iter(self._channels.values()))[0]
+            self._write_log(f"### ⏳ Still channeling `{busy}`...\n\nWait for it, or press Esc to break it off.")
+            return
+        worker = self.run_worker(work, name=label, group="channel")
+        self._channels[worker] = (label, cancellable)
+        if self._channel_timer is None:
+            self._channel_tick = 0
+            self._channel_timer = self.set_interval(self.CHANNEL_INTERVAL, self._animate_channel)
+        self._animate_channel()
+
+    def _animate_channel(self) -> None:
+        if not self._channels:
+            return
+        label, cancellable = next(iter(self._channels.values()))
+        self._channel_tick += 1
+        frame = self.CHANNEL_FRAMES[self._channel_tick % len(self.CHANNEL_FRAMES)]
+        self.query_one("#prompt", Static).update(f"{frame} ")
+        self.sub_title = f"Channeling {label}…" + (" (Esc to break off)" if cancellable else "")
+
+    def on_worker_state_changed(self, event: Worker.StateChanged) -> None:
+        if event.worker not in self._channels or not event.worker.is_finished:
+            return
+        del self._channels[event.worker]
+        if not self._channels and self._channel_timer is not None:
+            self._channel_timer.stop()
+            self._channel_timer = None
+            self.query_one("#prompt", Static).update("> ")
+            self.sub_title = ""
+
+    def _mutate_repo(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a repo-mutating git call (on a worker thread) under the repo lock."""
+        with self._repo_lock:
+            return fn(*args, **kwargs)
+
     # ------------------------------------------------------------------
     # Text helpers
     # ------------------------------------------------------------------
@@ -198,7 +483,7 @@ class CommitQuest(App[None]):
             "### 🏰 You awaken in the Repo Dungeon...\n\n"
             f"- **Dungeon:** `{self.project_dir}`\n"
             f"- **Git:** `{repo_status}`\n"
-            f"- **Ollama Model:** `{self.cfg.get('model', DEFAULT_MODEL)}`\n\n"
+            f"- **Ollama Model:** `{self.cfg.get('model', DEFAULT_MODEL)}` (warming up…)\n\n"
             "Type `map` to reveal rooms.\n"
             "Type `enter <room>` to explore a room.\n"
             "Type `scan` to search for enemies.\n"
@@ -207,11 +492,7 @@ class CommitQuest(App[None]):
         )
 
     def _write_log(self, md: str) -> None:
-        if self._log_md:
-            self._log_md += "\n\n---\n\n" + md
-        else:
-            self._log_md = md
-        self.query_one("#log_md", Markdown).update(self._log_md)
+        self.query_one("#log", CombatLog).append(md)
 
     @staticmethod
     def _parse(raw: str) -> List[str]:
@@ -238,6 +519,7 @@ class CommitQuest(App[None]):
             f"XP {self.player.xp} | "
             f"Defeated {self.player.enemies_defeated} | "
             f"Mode {self.last_summary.get('mode', 'unstaged')} | "
+            f"Model {model_warmth(self.cfg)} | "
             f"Enemy {enemy_txt}"
         )
 
@@ -250,24 +532,25 @@ class CommitQuest(App[None]):
     # ------------------------------------------------------------------
 
     def _apply_room_filter(self, summary: Dict[str, Any]) -> Dict[str, Any]:
-        """Return a copy of summary filtered to files under current_room."""
+        """Return a copy of summary filtered to files under current_room.
+
+        The room is a subtree lookup in a PathTrie of the diff, so the
+        insertion/deletion totals are exact per-file sums.
+        """
         if self.current_room == "root":
             return summary
 
-        prefix = f"{self.current_room}/"
-        files: List[str] = list(summary.get("files", []))
-        kept = [f for f in files if f.startswith(prefix)]
-
-        frac = len(kept) / max(1, len(files)) if files else 0.0
-        ins  = int(round(int(summary.get("insertions", 0)) * frac))
-        dels = int(round(int(summary.get("deletions",  0)) * frac))
+        node = PathTrie.from_summary(summary).find(self.current_room)
+        entries = node.file_list() if node is not None else []
 
         return {
             **summary,
-            "files":        kept,
-            "insertions":   ins,
-            "deletions":    dels,
-            "summary_text": f"Room '{self.current_room}': {len(kept)} file(s) changed",
+            "files":        [p for p, _ in entries],
+            "per_file":     [(p, st.insertions, st.deletions) for p, st in entries],
+            "renames":      [(st.old_path, p) for p, st in entries if st.old_path],
+            "insertions":   node.insertions if node is not None else 0,
+            "deletions":    node.deletions if node is not None else 0,
+            "summary_text": f"Room '{self.current_room}': {len(entries)} file(s) changed",
         }
 
     # ------------------------------------------------------------------
@@ -284,147 +567,44 @@ class CommitQuest(App[None]):
     ]
 
     def _arena_seed(self) -> int:
-        files = ",".join(list(self.last_summary.get("files", []))[:50])
+        files = self.last_summary.get("files", [])
+        key = (
+            self.current_room, self.player.floor, self.last_summary.get("mode"),
+            self.last_summary.get("insertions"), self.last_summary.get("deletions"), len(files),
+        )
+        # The files list is kept in the cache so the `is` check stays valid
+        cached = self._seed_cache
+        if cached is not None and cached[0] == key and cached[1] is files:
+            return cached[2]
+
+        names = ",".join(list(files)[:50])
         sig = (
             f"{self.project_dir}|{self.current_room}|{self.player.floor}|"
             f"{self.last_summary.get('mode')}|{self.last_summary.get('insertions')}|"
-            f"{self.last_summary.get('deletions')}|{files}"
+            f"{self.last_summary.get('deletions')}|{names}"
         )
-        return int(hashlib.sha256(sig.encode()).hexdigest()[:8], 16)
+        seed = int(hashlib.sha256(sig.encode()).hexdigest()[:8], 16)
+        self._seed_cache = (key, files, seed)
+        return seed
 
     def _render_corridor(self, W: int, H: int) -> List[str]:
-        """Draw a first-person dungeon corridor matching Arena's perspective.
-
-        Key visual elements from the reference:
-          - Dark open void in the CENTER — walls are on the SIDES only
-          - Stone brick walls converge from left/right toward a vanishing point
-          - Chains hanging from the ceiling near the walls
-          - Ceiling is a dark slab with slight texture
-          - Floor is dark near the horizon, gains tile texture near camera
-          - Inner wall face shows a diagonal converging line (\\ and /)
-        """
-        rng    = random.Random(self._arena_seed())
-        lines: List[str] = []
-
-        ceil_h  = max(2, H * 22 // 100)
-        floor_h = max(2, H * 28 // 100)
-        mid_h   = H - ceil_h - floor_h
-        half    = W // 2
-
-        ins  = int(self.last_summary.get("insertions", 0))
-        dels = int(self.last_summary.get("deletions",  0))
-        heat = ins + dels
-
-        # ── ceiling ───────────────────────────────────────────────────────
-        lines.append("+" + "-" * (W - 2) + "+")
-        for row in range(1, ceil_h):
-            t         = row / ceil_h          # 0=top, 1=bottom of ceiling band
-            row_chars = [" "] * W
-            # converging perspective lines from top corners toward center
-            left_x  = max(0, int(half * (1.0 - t)))
-            right_x = W - 1 - left_x
-            if 0 <= left_x < W:
-                row_chars[left_x]  = "\\"
-            if 0 <= right_x < W:
-                row_chars[right_x] = "/"
-            # sparse ceiling drip/texture between the lines
-            for c in range(left_x + 1, right_x):
-                if rng.random() < 0.025:
-                    row_chars[c] = rng.choice(["'", "`", ".", ","])
-            # chains at ~W/4 and 3W/4 — only in upper ceiling rows
-            for cx in [W // 4, 3 * W // 4]:
-                if 0 <= cx < W and t < 0.75:
-                    row_chars[cx] = "|" if row % 2 == 0 else "+"
-            lines.append("".join(row_chars))
-
-        # ── corridor walls + dark center ──────────────────────────────────
-        # Brick chars vary by diff heat so the room feels different each time
-        if heat > 180:
-            b1, b2 = "8", "="   # heavily modified — solid brick
-        elif heat > 60:
-            b1, b2 = "H", "-"   # medium activity
-        else:
-            b1, b2 = "[", "]"   # quiet hall — carved stone blocks
-
-        for row in range(mid_h):
-            t      = row / max(1, mid_h - 1)
-            wall_w = max(2, int(W * (0.06 + 0.32 * t)))
-            row_chars = list(" " * W)
-
-            # Build brick columns — alternating rows offset for realism
-            brick_offset = 2 if (row // 2) % 2 == 1 else 0
-            for c in range(wall_w):
-                bpos = (c + brick_offset) % 5
-                if bpos == 0:
-                    ch = "|"
-                elif bpos == 4 and row % 3 == 0:
-                    ch = "+"
-                elif row % 3 == 0:
-                    ch = "-"
-                else:
-                    ch = b1 if (c % 2 == 0) else b2
-                row_chars[c]             = ch
-                row_chars[W - 1 - c]     = ch
-
-            # Inner wall face — perspective diagonal becomes vertical near camera
-            inner_l = "\\" if t < 0.6 else "|"
-            inner_r = "/" if t < 0.6 else "|"
-            if wall_w < W // 2:
-                row_chars[wall_w]         = inner_l
-                row_chars[W - 1 - wall_w] = inner_r
-
-            # Torch sconces at 1/3 and 2/3 depth
-            if row == mid_h // 3 and wall_w >= 3:
-                row_chars[wall_w - 2] = "}"
-                row_chars[wall_w - 1] = "*"
-                row_chars[W - wall_w]     = "*"
-                row_chars[W - wall_w + 1] = "{"
-            if row == (mid_h * 2) // 3 and wall_w >= 2:
-                row_chars[wall_w - 1] = "}"
-                row_chars[W - wall_w] = "{"
-
-            lines.append("".join(row_chars)[:W].ljust(W))
-
-        # ── floor ─────────────────────────────────────────────────────────
-        for row in range(floor_h):
-            t         = row / max(1, floor_h - 1)  # 0=horizon, 1=near camera
-            row_chars = [" "] * W
-            # perspective convergence lines
-            floor_x = max(0, int(half * (1.0 - t)))
-            if floor_x < half:
-                row_chars[floor_x]         = "/"
-                row_chars[W - 1 - floor_x] = "\\"
-            # tile texture only appears close to camera
-            if t > 0.35:
-                tile_w = max(2, int(2 + t * 7))
-                for c in range(floor_x + 1, W - floor_x - 1):
-                    local = c % tile_w
-                    if local == 0:
-                        row_chars[c] = "+"
-                    elif t > 0.65 and rng.random() < 0.08:
-                        row_chars[c] = rng.choice([".", ",", "_"])
-                    else:
-                        row_chars[c] = "-" if (c // tile_w) % 2 == 0 else "_"
-            lines.append("".join(row_chars))
-
-        # bottom edge
-        if len(lines) < H:
-            lines.append("+" + "=" * (W - 2) + "+")
-
-        return [ln[:W].ljust(W) for ln in lines[:H]]
-
-    def _render_enemy_sprite(self, corridor: List[str], W: int) -> List[str]:
+        """Background layer for the current arena (see _corridor_layer)."""
+        heat = int(self.last_summary.get("insertions", 0)) + int(self.last_summary.get("deletions", 0))
+        return list(_corridor_layer(self._arena_seed(), W, H, _heat_tier(heat)))
+
+    def _render_enemy_sprite(self, grid: CharGrid) -> None:
         """Composite the enemy ASCII sprite into the mid-section of the corridor."""
         cur = self._current_enemy()
         if not cur:
-            return corridor
+            return
 
         art, _ = get_enemy(cur.kind)
         sprite_lines = [l for l in art.strip().splitlines() if l.strip()]
         if not sprite_lines:
-            return corridor
+            return
 
-        ceil_h = max(2, len(corridor) * 33 // 100)
+        W = grid.width
+        ceil_h = max(2, grid.height * 33 // 100)
 
         max_sw = max(len(l) for l in sprite_lines)
         scale  = max(1, int(W * 0.35) // max(1, max_sw))
@@ -439,59 +619,48 @@ class CommitQuest(App[None]):
         filled = int(bar_w * hp_pct)
         hp_bar = f"[{'#' * filled}{'.' * (bar_w - filled)}] {cur.hp}hp"
         hp_row = ceil_h - 1
-        lines  = list(corridor)
-
-        if 0 <= hp_row < len(lines):
-            row = list(lines[hp_row].ljust(W))
-            hx  = max(0, (W - len(hp_bar)) // 2)
-            for i, ch in enumerate(hp_bar):
-                if hx + i < W:
-                    row[hx + i] = ch
-            lines[hp_row] = "".join(row)
-
-        start_row = ceil_h
-        for si, sline in enumerate(sprite_lines):
-            ri = start_row + si
-            if ri >= len(lines):
-                break
-            row = list(lines[ri].ljust(W))
-            for ci, ch in enumerate(sline):
-                if sx + ci < W and ch != " ":
-                    row[sx + ci] = ch
-            lines[ri] = "".join(row)
 
-        return lines
+        if 0 <= hp_row < grid.height:
+            grid.burn(max(0, (W - len(hp_bar)) // 2), hp_row, hp_bar)
+
+        grid.sprite(sx, ceil_h, sprite_lines)
 
-    def _render_status_overlay(self, corridor: List[str], W: int) -> List[str]:
+    def _render_status_overlay(self, grid: CharGrid) -> None:
         """Burn status line into the top-left of the view."""
-        lines = list(corridor)
-        cur   = self._current_enemy()
+        cur = self._current_enemy()
 
         top_left = (
             f" FL:{self.player.floor} {self.current_room} | "
             f"Lv{self.player.level} {self.player.title} | "
             f"XP:{self.player.xp} "
-        )[:W]
-
-        if lines:
-            row      = list(lines[0].ljust(W))
-            for i, ch in enumerate(top_left):
-                row[i] = ch
-            lines[0] = "".join(row)
-
-        if cur and len(lines) > 1:
-            enemy_txt = f" {cur.name}  HP:{cur.hp} [{self.enemy_index+1}/{len(self.enemies)}] "[:W]
-            row       = list(lines[1].ljust(W))
-            for i, ch in enumerate(enemy_txt):
-                row[i] = ch
-            lines[1]  = "".join(row)
+        )
+        grid.burn(0, 0, top_left)
 
-        return lines
+        if cur:
+            grid.burn(0, 1, f" {cur.name}  HP:{cur.hp} [{self.enemy_index+1}/{len(self.enemies)}] ")
 
     def _generate_arena(self, width: int = 80, height: int = 22) -> List[str]:
-        corridor = self._render_corridor(width, height)
-        corridor = self._render_enemy_sprite(corridor, width)
-        corridor = self._render_status_overlay(corridor, width)
+        """Background + sprite + overlay layers, composited once per state.
+
+        Animation frames only change the HUD rows below the arena, so they
+        reuse this list (callers must not mutate it).
+        """
+        cur = self._current_enemy()
+        key = (
+            self._arena_seed(), width, height,
+            self.last_summary.get("insertions"), self.last_summary.get("deletions"),
+            id(cur), cur.hp if cur else None, self.enemy_index, len(self.enemies),
+            self.player.floor, self.player.level, self.player.xp, self.current_room,
+        )
+        cached = self._arena_cache
+        if cached is not None and cached[0] == key and cached[1] is cur:
+            return cached[2]
+
+        grid = CharGrid.from_lines(self._render_corridor(width, height), width, height)
+        self._render_enemy_sprite(grid)
+        self._render_status_overlay(grid)
+        corridor = grid.lines()
+        self._arena_cache = (key, cur, corridor)
         return corridor
 
     def _build_view(
@@ -510,8 +679,12 @@ class CommitQuest(App[None]):
         `frame` is a HandFrame (left_lines, right_lines) from PlayerHUD.
         If None, the idle pose is used.
         """
-        corridor = self._generate_arena(width, height)
-        sep      = "═" * width
+        return "\n".join(self._generate_arena(width, height)) + self._hud_block(frame, width)
+
+    def _hud_block(self, frame: Optional[HandFrame], width: int) -> str:
+        """Separator and HUD rows for `frame`, starting with a newline so it
+        can be appended to the corridor text."""
+        sep = "═" * width
 
         left_lines: List[str]
         right_lines: List[str]
@@ -527,19 +700,23 @@ class CommitQuest(App[None]):
         rh: List[str] = (list(right_lines) + [""] * nrows)[:nrows]
         wp: List[str] = (list(weapon)      + [""] * nrows)[:nrows]
 
-        hand_w = max((len(l) for l in lh + rh), default=14)
-        wep_w  = max((len(l) for l in wp),       default=8)
-        gap_w  = max(1, (width - hand_w * 2 - wep_w) // 2)
+        hud_key = (width, tuple(lh), tuple(rh), tuple(wp))
+        hud_rows = self._hud_cache.get(hud_key)
+        if hud_rows is None:
+            hand_w = max((len(l) for l in lh + rh), default=14)
+            wep_w  = max((len(l) for l in wp),       default=8)
+            gap_w  = max(1, (width - hand_w * 2 - wep_w) // 2)
 
-        hud_block: List[str] = []
-        for i in range(nrows):
-            left_str:  str = lh[i].ljust(hand_w)[:hand_w]
-            wep_str:   str = wp[i].center(wep_w)
-            right_str: str = rh[i].ljust(hand_w)[:hand_w]
-            gap            = " " * gap_w
-            hud_block.append((left_str + gap + wep_str + gap + right_str)[:width].ljust(width))
+            hud = CharGrid(width, nrows)
+            wep_x   = hand_w + gap_w
+            right_x = wep_x + wep_w + gap_w
+            for i in range(nrows):
+                hud.burn(0, i, lh[i][:hand_w])
+                hud.burn(wep_x, i, wp[i].center(wep_w))
+                hud.burn(right_x, i, rh[i][:hand_w])
+            hud_rows = self._hud_cache[hud_key] = hud.lines()
 
-        return "\n".join(corridor + [sep] + hud_block)
+        return "\n" + "\n".join([sep] + hud_rows)
 
     def _arena_text(self, frame: Optional[HandFrame] = None) -> str:
         return self._build_view(frame)
@@ -563,29 +740,64 @@ class CommitQuest(App[None]):
     def _hud_cast_frames(self) -> List[HandFrame]:
         return PlayerHUD.cast_frames()
 
-    def _render_arena(self) -> None:
-        widget = self.query_one("#arena", Static)
+    def _viewport(self) -> Tuple[int, int]:
+        """(width, corridor height) the arena is drawn at."""
+        widget = self.query_one("#arena", ArenaView)
         vw = widget.content_size.width
         vh = widget.content_size.height
         if vw < 10:
             vw = (self.app.size.width  or 120) - 4 # type: ignore
         if vh < 5:
             vh = (self.app.size.height or 40) - 22 # pyright: ignore[reportUnknownMemberType]
-        corridor_h = max(8, vh - HUD_ROWS - 2)
-        widget.update(self._build_view(self._hud_idle(), width=max(40, vw), height=corridor_h))
+        return max(40, vw), max(8, vh - HUD_ROWS - 2)
+
+    @traced(cat="tui")
+    def _render_arena(self) -> None:
+        width, corridor_h = self._viewport()
+        self._viewport_size = (width, corridor_h)
+        self.query_one("#arena", ArenaView).update(self._build_view(self._hud_idle(), width=width, height=corridor_h))
 
     # ------------------------------------------------------------------
     # Async animation helpers
     # ------------------------------------------------------------------
 
-    async def _play_frames(self, frames: List[HandFrame], delay: float = 0.07) -> None:
-        widget = self.query_one("#arena", Static)
-        vw = widget.content_size.width  or (self.app.size.width  - 4) # type: ignore
-        vh = widget.content_size.height or (self.app.size.height - 22) # pyright: ignore[reportUnknownMemberType]
-        corridor_h = max(8, vh - HUD_ROWS - 2)
-        for frame in frames:
-            widget.update(self._build_view(frame, width=max(40, vw), height=corridor_h))
-            await asyncio.sleep(delay)
+    def _animation(self, name: str, width: int, height: int) -> Tuple[str, ...]:
+        """Every frame of the `attack` or `cast` sequence over the current
+        arena. Only the HUD below the corridor moves, so its rows are
+        rendered once per (weapon, width) and reused across swings while
+        enemy HP, XP and the like change."""
+        key = (name, self.last_commit_type, width)
+        huds = self._frame_cache.get(key)
+        if huds is not None:
+            self._frame_cache.move_to_end(key)
+        else:
+            hands = self._hud_attack_frames() if name == "attack" else self._hud_cast_frames()
+            with trace_span("prerender", "tui", {"animation": name, "frames": len(hands)}):
+                huds = self._frame_cache[key] = tuple(self._hud_block(hand, width) for hand in hands)
+            while len(self._frame_cache) > self.FRAME_CACHE_SIZE:
+                self._frame_cache.popitem(last=False)
+        arena = "\n".join(self._generate_arena(width, height))
+        return tuple(arena + hud for hud in huds)
+
+    @traced(cat="tui")
+    async def _play_frames(self, name: str, delay: float = 0.07) -> None:
+        """Play an animation at one frame per `delay` seconds of monotonic
+        time. A frame whose slot has already passed (slow terminal, busy
+        loop) is skipped, so the animation keeps its intended duration."""
+        widget = self.query_one("#arena", ArenaView)
+        frames = self._animation(name, *self._viewport())
+        start = time.monotonic()
+        shown = -1
+        while True:
+            i = int((time.monotonic() - start) / delay)
+            if i >= len(frames):
+                break
+            if i > shown + 1 and TRACER.enabled:
+                TRACER.instant("frames_dropped", "tui", {"animation": name, "dropped": i - shown - 1})
+            with trace_span("frame", "tui", {"i": i}):
+                widget.update(frames[i])
+            shown = i
+            await asyncio.sleep(max(0.0, start + (i + 1) * delay - time.monotonic()))
         self._render_arena()
 
     async def _cast(self) -> None:
@@ -594,7 +806,7 @@ class CommitQuest(App[None]):
             return
         cur    = self._current_enemy()
         target = cur.name if cur else "the darkness"
-        await self._play_frames(self._hud_cast_frames(), delay=0.08)
+        await self._play_frames("cast", delay=0.08)
         self._write_log(
             "### 🪄 You cast a spell\n\n"
             f"**Target:** `{target}`\n\n"
@@ -604,7 +816,7 @@ class CommitQuest(App[None]):
     async def _swing(self) -> None:
         cur    = self._current_enemy()
         target = cur.name if cur else "the air"
-        await self._play_frames(self._hud_attack_frames(), delay=0.06)
+        await self._play_frames("attack", delay=0.06)
         self._write_log(f"### ⚔️ You swing at `{target}`")
 
     # ------------------------------------------------------------------
@@ -652,13 +864,15 @@ class CommitQuest(App[None]):
         )
         self._render_arena()
 
-    def _scan(self, mode: str) -> None:
+    @traced(cat="tui")
+    async def _scan(self, mode: str) -> None:
         if self.repo is None:
             self._write_log("### ❌ No git repo found.\n\nMove into a repo and run again.")
             return
 
         mode    = mode if mode in ("staged", "unstaged") else "unstaged"
-        summary = self._apply_room_filter(get_changes_summary(self.repo, mode=mode))
+        summary = await asyncio.to_thread(get_changes_summary, self.repo, mode=mode)
+        summary = self._apply_room_filter(summary)
         self.last_summary = summary
 
         files      = summary["files"][:20]
@@ -678,7 +892,8 @@ class CommitQuest(App[None]):
         self._render_arena()
         self._update_status()
 
-    def _generate(self, commit_type: str, custom_message: str = "") -> None:
+    @traced(cat="tui")
+    async def _generate(self, commit_type: str, custom_message: str = "") -> None:
         if self.repo is None:
             self._write_log("### ❌ No git repo found.")
             return
@@ -695,20 +910,108 @@ class CommitQuest(App[None]):
             else "general updates"
         )
 
-        msg = generate_commit_message(
-            commit_type=commit_type,
-            custom_message=custom_message,
-            config=self.cfg,
-            diff_summary=str(diff_summary),
-        )
+        # Set when Esc breaks the channeling off; the next streamed token
+        # then aborts the request so Ollama stops generating
+        broken = threading.Event()
+
+        def on_token(_: str) -> None:
+            if broken.is_set():
+                raise RuntimeError("channeling broken off")
+
+        try:
+            result = await asyncio.to_thread(
+                compose_commit_message,
+                commit_type=commit_type,
+                custom_message=custom_message,
+                config=self.cfg,
+                diff_summary=str(diff_summary),
+                summary=self.last_summary,
+                cache=get_response_cache(self.project_dir),
+                on_token=on_token,
+            )
+        except asyncio.CancelledError:
+            broken.set()
+            raise
+        msg = result["message"]
         self.last_message = msg
+        self.spell_candidates = []
+        rune = (
+            "\n\n*The spirits were silent — an offline rune was scribed instead.*"
+            if result["source"] == "fallback" else ""
+        )
+        if result.get("error"):
+            rune += f"\n\n*The spellbook resisted:* `{result['error']}`"
         self._write_log(
             f"### ✨ Spell Prepared for `{cur.name}`\n\n"
-            f"`{msg}`\n\n"
+            f"`{msg}`{rune}\n\n"
             "Use `commit` to attack."
         )
         self._render_arena()
 
+    @traced(cat="tui")
+    async def _generate_candidates(self, commit_type: str, n: int) -> None:
+        """Channel several spells concurrently and let the player pick one."""
+        if self.repo is None:
+            self._write_log("### ❌ No git repo found.")
+            return
+
+        cur = self._current_enemy()
+        if not cur:
+            self._write_log("### ⚠️ No enemy.\n\nRun `scan` first so there's something to fight.")
+            return
+
+        self.last_commit_type = (commit_type or "chore").strip().lower()
+        diff_summary = (
+            self.last_summary.get("summary_text")
+            if self.last_summary.get("files")
+            else "general updates"
+        )
+
+        self._write_log(f"### 🔮 Channeling `{n}` spells...")
+        error = ""
+        try:
+            candidates = await agenerate_commit_messages(
+                commit_type,
+                self.cfg,
+                str(diff_summary),
+                n=n,
+                deadline=llm_deadline(self.cfg),
+                cache=get_response_cache(self.project_dir),
+            )
+        except Exception as e:  # every candidate failed: fall back like a single spell
+            candidates = []
+            error = f"\n\n*The spellbook resisted:* `{e.__class__.__name__}: {e}`"
+        if not candidates:
+            self.last_message = local_commit_message(normalize_commit_type(commit_type), self.last_summary)
+            self.spell_candidates = []
+            self._write_log(
+                "### 💨 The spells fizzled.\n\n"
+                f"An offline rune was scribed instead: `{self.last_message}`{error}\n\n"
+                "Use `commit` to attack."
+            )
+            self._render_arena()
+            return
+
+        self.spell_candidates = candidates
+        self.last_message     = candidates[0]
+        listing = "\n".join(f"{i}. `{c}`" for i, c in enumerate(candidates, 1))
+        self._write_log(
+            f"### ✨ Spells Prepared for `{cur.name}`\n\n"
+            f"{listing}\n\n"
+            "Spell `1` is readied. Use `pick <n>` to ready another, then `commit`."
+        )
+        self._render_arena()
+
+    def _pick(self, choice: str) -> None:
+        if not self.spell_candidates:
+            self._write_log("### ⚠️ No spells to choose from.\n\nRun `gen <type> <n>` first.")
+            return
+        if not choice.isdigit() or not 1 <= int(choice) <= len(self.spell_candidates):
+            self._write_log(f"### ⚠️ Usage\n\n`pick <1-{len(self.spell_candidates)}>`")
+            return
+        self.last_message = self.spell_candidates[int(choice) - 1]
+        self._write_log(f"### ✨ Spell readied\n\n`{self.last_message}`")
+
     def _commit(self) -> None:
         if self.repo is None:
             self._write_log("### ❌ No git repo found.")
@@ -723,20 +1026,28 @@ class CommitQuest(App[None]):
 
         cur = self._current_enemy()
         if not cur:
-            self._write_log("### 🌿 No enemy is present.\n\nBut we can still commit.")
-            self._write_log(f"### 🧾 Commit Result\n\n{maybe_auto_commit(repo, self.last_message, stage_all=True)}")
-            self._update_status()
+            async def _commit_only() -> None:
+                self._write_log("### 🌿 No enemy is present.\n\nBut we can still commit.")
+                result = await asyncio.to_thread(
+                    self._mutate_repo, maybe_auto_commit, repo, self.last_message, stage_all=True
+                )
+                self._write_log(f"### 🧾 Commit Result\n\n{result}")
+                self._update_status()
+
+            self._channel("commit", _commit_only(), cancellable=False)
             return
 
-        # Fire-and-forget swing animation, then resolve commit synchronously.
-        # Using run_worker with a proper coroutine avoids blocking the event loop.
+        # Swing animation, then `git add -A` + commit on a worker thread.
+        # Not cancellable: once the blow lands the commit has to resolve.
         async def _swing_then_resolve() -> None:
             await self._swing()
 
             dmg    = self._damage()
             cur.hp = max(0, cur.hp - dmg)
 
-            result = maybe_auto_commit(repo, self.last_message, stage_all=True)
+            result = await asyncio.to_thread(
+                self._mutate_repo, maybe_auto_commit, repo, self.last_message, stage_all=True
+            )
             self._write_log(f"### 🧾 Commit Result\n\n{result}")
 
             if "failed" in result.lower():
@@ -749,6 +1060,7 @@ class CommitQuest(App[None]):
             self._write_log(f"### ☠️ `{cur.name}` is defeated!")
             self.enemy_index  += 1
             self.last_message  = ""
+            self.spell_candidates = []
 
             nxt = self._current_enemy()
             if nxt:
@@ -769,14 +1081,14 @@ class CommitQuest(App[None]):
 
             self._update_status()
 
-        self.run_worker(_swing_then_resolve(), exclusive=True)
+        self._channel("commit", _swing_then_resolve(), cancellable=False)
 
     def _help(self) -> None:
         self._write_log(
             "### Commands\n\n"
-            "- `map` — show dungeon layout with lore room names\n"
+            "- `map [page]` — show dungeon layout with lore room names\n"
             "- `room` — inspect the current room as a full ASCII chamber\n"
-            "- `enter <room>` — move into a room (or `enter root`)\n"
+            "- `enter <room>` — move into a room, at any depth (`enter src/api`, or `enter root`)\n"
             "- `arena` — show the current procedurally-generated arena\n"
             "- `cast` — animate + display your prepared commit-message spell\n"
             "- `help` — show this\n"
@@ -784,6 +1096,8 @@ class CommitQuest(App[None]):
             "- `scan staged` — scan staged changes\n"
             "- `mode staged|unstaged` — set default scan mode\n"
             "- `gen <type>` — generate AI commit spell (feat/fix/chore/docs/refactor/test)\n"
+            "- `gen <type> <n>` — channel up to 5 spells at once, then `pick <n>`\n"
+            "- `Esc` — break off a slow `scan` or `gen`\n"
             "- `say <type> <message...>` — write your own spell\n"
             "- `commit` — attack + auto-commit (defeats current enemy on success)\n"
             "- `stats` — show player stats\n"
@@ -791,12 +1105,24 @@ class CommitQuest(App[None]):
         )
 
     def _stats(self) -> None:
+        if DUNGEON_SOURCE == "fs":
+            idx = get_dungeon_index(self.project_dir).stats()
+            dungeon = f"`{idx['dirs']}` halls ({idx['scanned']} re-mapped last time)"
+        else:
+            dungeon = f"`{len(self.dungeon)}` rooms from `{DUNGEON_SOURCE}`"
+        rc = render_cache_stats()
+        log = self.query_one("#log", CombatLog).buffer
+        spilled = f", {log.spilled} spilled to `{log.spill_path}`" if log.spill_path else ""
         self._write_log(
             "### 🏆 Adventurer Stats\n\n"
             f"- **Floor:** `{self.player.floor}`\n"
             f"- **Level:** `{self.player.level}` ({self.player.title})\n"
             f"- **XP:** `{self.player.xp}`\n"
             f"- **Enemies Defeated:** `{self.player.enemies_defeated}`\n"
+            f"- **Model:** `{self.cfg.get('model', DEFAULT_MODEL)}` ({model_warmth(self.cfg)})\n"
+            f"- **Dungeon:** {dungeon}\n"
+            f"- **Room Renders Cached:** `{rc['entries']}` ({rc['hits']} hits / {rc['misses']} misses)\n"
+            f"- **Log:** `{len(log)}` of `{log.total}` entries kept{spilled}\n"
         )
 
     def _set_mode(self, mode: str) -> None:
@@ -808,9 +1134,12 @@ class CommitQuest(App[None]):
         self._write_log(f"### ✅ Default scan mode set to `{mode}`")
         self._update_status()
 
-    def _map(self) -> None:
+    def _map(self, page: str = "") -> None:
         self.dungeon = build_dungeon(self.project_dir)
-        text         = render_map(self.dungeon, commit_type=self.last_commit_type)
+        text         = render_map(
+            self.dungeon, commit_type=self.last_commit_type,
+            page=int(page) if page.isdigit() else 1, page_size=self.MAP_PAGE_SIZE,
+        )
         room_hint    = self.current_room
         self._write_log(
             "### 🗺️ Dungeon Map\n\n"
@@ -831,7 +1160,8 @@ class CommitQuest(App[None]):
             return
 
         self.dungeon = build_dungeon(self.project_dir)
-        files        = self.dungeon.get(self.current_room, [])
+        node         = room_trie(self.dungeon).find(self.current_room)
+        files        = [p for p, _ in node.file_list()] if node is not None else []
         art          = render_room(
             self.current_room, files,
             commit_type=self.last_commit_type,
@@ -844,7 +1174,7 @@ class CommitQuest(App[None]):
         )
 
     def _enter(self, room: str) -> None:
-        room = (room or "").strip()
+        room = (room or "").strip().strip("/")
         if not room or room == "root":
             self.current_room = "root"
             self._write_log("### 🚪 You return to the dungeon entrance (root).")
@@ -852,14 +1182,19 @@ class CommitQuest(App[None]):
             return
 
         self.dungeon = build_dungeon(self.project_dir)
-        if room not in self.dungeon:
-            rooms = ", ".join(sorted(self.dungeon.keys())) or "(no rooms found)"
+        trie = room_trie(self.dungeon)
+        node = trie.find(room)
+        if node is None or node is trie.root:
+            near  = trie.closest(room)
+            rooms = ", ".join(sorted(near.children)) or "(no rooms found)"
+            where = f" under `{near.path}`" if near.path else ""
             self._write_log(
                 "### ⚠️ Unknown room\n\n"
-                f"Room `{room}` does not exist. Available rooms: {rooms}\n\n"
+                f"Room `{room}` does not exist. Available rooms{where}: {rooms}\n\n"
                 "Tip: run `map` to see the layout."
             )
             return
+        room = node.path
 
         self.current_room = room
         name = lore_name(room, self.last_commit_type)
@@ -887,7 +1222,6 @@ class CommitQuest(App[None]):
             "exit":   self.exit,
             "help":   self._help,
             "stats":  self._stats,
-            "map":    self._map,
             "room":   self._room,
             "arena":  self._arena,
         }
@@ -896,7 +1230,9 @@ class CommitQuest(App[None]):
             dispatch[cmd]()
             return
 
-        if cmd == "enter":
+        if cmd == "map":
+            self._map(parts[1] if len(parts) > 1 else "")
+        elif cmd == "enter":
             self._enter(parts[1] if len(parts) > 1 else "")
         elif cmd == "cast":
             self.run_worker(self._cast(), exclusive=True)
@@ -904,15 +1240,22 @@ class CommitQuest(App[None]):
             self._set_mode(parts[1] if len(parts) > 1 else "")
         elif cmd == "scan":
             mode = parts[1] if len(parts) > 1 else str(self.last_summary.get("mode", "unstaged"))
-            self._scan(mode)
+            self._channel("scan", self._scan(mode))
         elif cmd == "gen":
-            self._generate(parts[1] if len(parts) > 1 else "chore")
+            ctype = parts[1] if len(parts) > 1 else "chore"
+            count = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else 1
+            if count > 1:
+                self._channel("gen", self._generate_candidates(ctype, min(count, 5)))
+            else:
+                self._channel("gen", self._generate(ctype))
+        elif cmd == "pick":
+            self._pick(parts[1] if len(parts) > 1 else "")
         elif cmd == "say":
             if len(parts) < 3:
                 self._write_log("### ⚠️ Usage\n\n`say <type> <message...>`")
             else:
                 self.last_commit_type = parts[1].lower() or "feat"
-                self._generate(parts[1], custom_message=" ".join(parts[2:]))
+                self._channel("say", self._generate(parts[1], custom_message=" ".join(parts[2:])))
         elif cmd == "commit":
             self._commit()
         else:
@@ -920,4 +1263,12 @@ class CommitQuest(App[None]):
 
 
 if __name__ == "__main__":
-    CommitQuest().run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(prog="commit-quest")
+    parser.add_argument("--trace", default=None, help="Write a Chrome trace of the session to this file.")
+    args = parser.parse_args()
+    if args.trace:
+        tracing.start(args.trace)
+    CommitQuest().run()
+    path = tracing.stop()
+    if path:
+        print(f"Trace written to {path}", file=sys.stderr)
\ No newline at end of file